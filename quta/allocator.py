@@ -1,34 +1,468 @@
+# pylint: disable=too-many-lines
 """
 Module containing the core allocation solver functionality
 """
 
+import os
+import time
 import warnings
 import itertools
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from abc import ABC, abstractmethod
 
 import numpy as np
 import quadprog
 
 from quta.thruster import Thruster
-from quta.constraints import concatenate_constraints, pad_constraints
+from quta.instrumentation import AllocationStats, AllocationDiagnostics
+from quta.solvers import BACKENDS, OPTIMAL, SolverBackend, SolverResult
+from quta.symmetry import find_symmetries
+from quta.constraints import concatenate_constraints
 
 DOFS = 3
 
+# Relative tolerance used when comparing objective bounds
+BOUND_TOLERANCE = 1e-9
+
+# Relative tolerance of the feasibility screen of combinations
+SCREEN_TOLERANCE = 1e-9
+
+# Constraints pinning the thrust of a disabled thruster to zero
+_DISABLED = (np.eye(2), np.zeros(2), 2)
+for _array in _DISABLED[:2]:
+    _array.setflags(write=False)
+
+
+# pylint: disable=invalid-name
+def _solve_chunk(backend, problems):
+    """
+    Solve a chunk of (combination, problem, C, b, n_eq)
+     problems with the backend. Module level to allow
+     for submission to process pools.
+    """
+    results = []
+    for combination, problem, C, b, n_eq in problems:
+        res = backend.solve(problem, C, b, n_eq)
+        results.append((combination, res if res.status == OPTIMAL else None))
+    return results
+
+
+def _warn_infeasible(combination):
+    warn_str = """This constraint combination has no solution:
+                {}""".format(combination)
+    warnings.warn(warn_str, UserWarning)
+
+
+# pylint: disable=invalid-name,too-many-locals
+def _solve_active_set(G, a, constraints, active):
+    """
+    Solve the QP assuming the given (0-based) set of active
+     inequality constraints, i.e. the equality constrained
+     KKT system. Returns a SolverResult if the solution is
+     primal and dual feasible, otherwise None.
+    """
+    C, b, n_eq = constraints
+    active = np.union1d(np.arange(n_eq), active).astype(int)
+    A = C[:, active].T
+    k = len(active)
+    n = len(a)
+
+    K = np.zeros((n + k, n + k))
+    K[:n, :n] = G
+    K[:n, n:] = -A.T
+    K[n:, :n] = A
+
+    try:
+        sol = np.linalg.solve(K, np.concatenate((a, b[active])))
+    except np.linalg.LinAlgError:
+        return None
+
+    x, lagr = sol[:n], sol[n:]
+
+    tol = BOUND_TOLERANCE * (1 + np.abs(b))
+    if np.any(C.T @ x < b - tol) or np.any(lagr[n_eq:] < -BOUND_TOLERANCE):
+        return None
+
+    lagrangian = np.zeros(len(b))
+    lagrangian[active] = lagr
+    f = 0.5 * x @ G @ x - a @ x
+    xu = np.linalg.solve(G, a)
+
+    return SolverResult(
+        x, f, xu, np.zeros(2, dtype=int), lagrangian, active + 1, OPTIMAL
+    )
+
+
+CacheInfo = namedtuple("CacheInfo", ("hits", "misses", "maxsize", "currsize"))
+
+
+# pylint: disable=invalid-name
+def _project(u, constraint_sets, tol=1e-9):
+    """
+    Nearest point to u within the union of the constraint
+     sets (C, b, n_eq), u itself if it is within one of them.
+     Returns u if all sets are empty.
+    """
+    best, distance = u, np.inf
+    for C, b, n_eq in constraint_sets:
+        residual = C @ u - b
+        eps = tol * (1 + np.abs(b))
+        if np.all(np.abs(residual[:n_eq]) <= eps[:n_eq]) and np.all(
+            residual[n_eq:] >= -eps[n_eq:]
+        ):
+            return u
+        try:
+            # pylint: disable=c-extension-no-member
+            x = quadprog.solve_qp(np.eye(2), u, np.array(C.T), np.array(b), n_eq)[0]
+        except ValueError:
+            continue
+        if np.linalg.norm(x - u) < distance:
+            best, distance = x, np.linalg.norm(x - u)
+    return best
+
+
+def _frozen(array):
+    array = array.copy()
+    array.flags.writeable = False
+    return array
+
+
+class _ResultCache:
+    """
+    LRU cache of allocation results keyed on the quantized
+     global thrust
+    """
+
+    __slots__ = ("resolution", "maxsize", "hits", "misses", "_entries")
+
+    def __init__(self, resolution, maxsize):
+        self.resolution = np.broadcast_to(np.asarray(resolution, dtype=float), DOFS)
+        if np.any(self.resolution <= 0):
+            raise ValueError("Cache resolution must be positive")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def key(self, global_thrust, relax, version):
+        """
+        Cache key of an allocation
+        """
+        cell = np.round(np.asarray(global_thrust, dtype=float) / self.resolution)
+        return (tuple(cell.astype(int).tolist()), relax, version)
+
+    def get(self, key):
+        """
+        Cached entry of key, or None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """
+        Add an entry, evicting the least recently used one
+         if full. The arrays of the result are stored as
+         read-only copies, as they are shared by all hits.
+        """
+        best, report = entry
+        if best is not None:
+            combination, res = best
+            res = res._replace(
+                **{
+                    field: _frozen(value)
+                    for field, value in res._asdict().items()
+                    if isinstance(value, np.ndarray)
+                }
+            )
+            entry = ((combination, res), report)
+        self._entries[key] = entry
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop all entries
+        """
+        self._entries.clear()
+
+    def info(self):
+        """
+        Hit and miss statistics
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+
+def _thrust_ranges(thruster):
+    """
+    Ranges [Fx, Fy, Mz] of the global thrust the thruster can
+     contribute under each of its disjuncts, as an array of
+     shape (disjunctions + 1, 2, DOFS) holding the lower and
+     upper bounds. The last entry covers all disjuncts. The
+     bounds are attained at vertices of the constraints, ranges
+     of constraints without vertices are unbounded.
+    """
+    lever = np.array([[1, 0, -thruster.pos_y], [0, 1, thruster.pos_x]])
+    ranges = []
+    for constraint in thruster.static_constraints():
+        try:
+            contribution = constraint.vertices @ lever
+        except NotImplementedError:
+            ranges.append([[-np.inf] * DOFS, [np.inf] * DOFS])
+            continue
+        ranges.append([contribution.min(axis=0), contribution.max(axis=0)])
+
+    ranges = np.array(ranges, dtype=float).reshape((-1, 2, DOFS))
+    if len(ranges):
+        union = [ranges[:, 0].min(axis=0), ranges[:, 1].max(axis=0)]
+    else:
+        union = [[-np.inf] * DOFS, [np.inf] * DOFS]
+    return np.concatenate((ranges, [union]))
+
+
+def _orbit(combination, symmetries):
+    """
+    All combinations the combination is mapped onto by
+     repeatedly applying the symmetries
+    """
+    orbit = {combination}
+    frontier = [combination]
+    while frontier:
+        current = frontier.pop()
+        for symmetry in symmetries:
+            image = symmetry.transform_combination(current)
+            if image not in orbit:
+                orbit.add(image)
+                frontier.append(image)
+    return orbit
+
 
 class AllocationError(Exception):
     """
-    AllocationError class
+    AllocationError class, carrying the AllocationDiagnostics
+     of the failed allocation (if any) as diagnostics.
     """
 
+    def __init__(self, message, diagnostics=None):
+        super().__init__(message)
+        self.diagnostics = diagnostics
+
+
+# pylint: disable=too-few-public-methods
+class _CompiledConstraints:
+    """
+    Compiled constraints of a combination. The right hand side
+     of the thruster constraints is kept unscaled in base along
+     with the thruster owning each row. The rate limits of the
+     rated thrusters follow as the last rows. b holds the right
+     hand side for the thrust scales and current thrust of the
+     given version.
+    """
+
+    __slots__ = ("C", "b", "n_eq", "base", "owner", "rated", "version")
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, C, b, n_eq, owner, rated, version):
+        self.C = C
+        self.b = b
+        self.n_eq = n_eq
+        self.base = b[DOFS : DOFS + len(owner)].copy()
+        self.owner = owner
+        self.rated = rated
+        self.version = version
+
+
+# pylint: disable=too-few-public-methods,too-many-instance-attributes
+class _Query:
+    """
+    Per-call state of an allocation
+    """
+
+    __slots__ = (
+        "G",
+        "a",
+        "global_thrust",
+        "relax",
+        "formulation",
+        "stats",
+        "infeasible",
+        "deadline",
+        "max_solves",
+        "solves",
+        "exhaustive",
+        "screened",
+    )
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, G, a, global_thrust, relax, *, formulation=None, stats=None):
+        self.G = G
+        self.a = a
+        self.global_thrust = global_thrust
+        self.relax = relax
+        self.formulation = formulation
+        self.stats = stats
+        self.infeasible = []
+        self.deadline = None
+        self.max_solves = None
+        self.solves = 0
+        self.exhaustive = True
+        self.screened = 0
+
+    @property
+    def budgeted(self):
+        """
+        Whether the search is bounded in time or number of solves
+        """
+        return self.deadline is not None or self.max_solves is not None
+
+    def out_of_budget(self):
+        """
+        Whether the budget is spent, marking the search as not
+         exhaustive if so.
+        """
+        if (self.max_solves is not None and self.solves >= self.max_solves) or (
+            self.deadline is not None and time.perf_counter() >= self.deadline
+        ):
+            self.exhaustive = False
+        return not self.exhaustive
+
 
+# pylint: disable=too-many-instance-attributes,too-many-public-methods
 class Allocator(ABC):
     """
     Abstract base class for allocation problem
      formulations.
+
+    By default, the constraint matrices are compiled
+     (cached) per combination of disjunct constraints
+     and reused between allocations. Set compiled=False
+     to assemble them from scratch on every call. Redundant
+     constraint rows of the thrusters, such as the end caps
+     of a Constraint1D not bounding the line segment, are
+     removed unless presolve=False.
+
+    With symmetry=True, mirror and 180 degree rotation
+     symmetries of the thruster layout are detected from the
+     thruster positions and the vertices of their constraints,
+     see quta.symmetry. For global thrusts invariant under a
+     symmetry, the exhaustive search only solves one combination
+     of each set of mirrored combinations, which share the same
+     objective. Such global thrusts have two of [Fx, Fy, Mz]
+     exactly zero, e.g. pure surge or pure yaw, so this only
+     pays off for setpoints of that kind.
+
+    Without slack variables (relax=False), combinations are
+     screened before solving. A combination is skipped if the
+     global thrust is outside the sum of the ranges of [Fx, Fy,
+     Mz] the selected disjuncts can contribute, which is a cheap
+     certificate of infeasibility. Skipped combinations are
+     reported as infeasible, their number as
+     AllocationStats.screened.
+
+    Rate limits of the thrusters (see Thruster.set_rate_limit)
+     are added as box constraints around the current thrust,
+     which allocate sets to the allocated thrust. Only the right
+     hand side of these rows is updated between allocations. A
+     current thrust the thruster cannot deliver, after derating
+     or as measured, is first projected onto its constraints.
+
+    The combinations of disjunct constraints are searched
+     either exhaustively (search="exhaustive") or by branch
+     and bound (search="branch_and_bound"), where subtrees are
+     pruned based on convex hull relaxations of the disjuncts.
+     Both find the same optimum.
+
+    With warm_start=True, the winning combination and active
+     set of the previous allocation are tried first. The active
+     set is verified by a single KKT solve before falling back
+     to a full QP, and the resulting objective is used as the
+     initial incumbent of the search. The exhaustive search
+     first solves the problem with every thruster relaxed to the
+     convex hull of its disjuncts, and skips all other
+     combinations if the incumbent attains that lower bound.
+
+    The exhaustive search can be spread across cores, see
+     set_executor. Per call statistics are available through
+     set_stats_callback.
+
+    Each combination is solved by a quta.solvers.SolverBackend,
+     given by name or instance as solver. The default "quadprog"
+     uses quadprog, "diagonal" solves formulations with a diagonal
+     Hessian with quta.solvers.DiagonalQP, which exploits the per
+     thruster structure of the constraints and scales linearly
+     with the number of thrusters. "nullspace" eliminates the
+     equality constraints once per combination and leaves a
+     smaller, inequality constrained QP to quadprog, which pays
+     off for layouts with many one dimensional thrusters.
+
+    Infeasible combinations are reported through the diagnostics
+     returned by allocate, set warn_infeasible=True to also emit
+     a UserWarning for each of them.
+
+    allocate accepts a time_budget and/or max_solves, bounding
+     the search. The combinations are then searched in order of
+     how well they fit the relaxed solution and the best
+     allocation found within the budget is returned, with the
+     diagnostics telling whether the search was exhaustive.
     """
 
-    def __init__(self):
+    SEARCH_METHODS = ("exhaustive", "branch_and_bound")
+    SOLVERS = tuple(BACKENDS)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        compiled=True,
+        search="exhaustive",
+        warm_start=False,
+        warn_infeasible=False,
+        solver="quadprog",
+        presolve=True,
+        symmetry=False,
+    ):
+        if search not in self.SEARCH_METHODS:
+            raise ValueError("Unknown search method: {}".format(search))
+        if not isinstance(solver, SolverBackend):
+            if solver not in self.SOLVERS:
+                raise ValueError("Unknown solver: {}".format(solver))
+            solver = BACKENDS[solver]()
+
         self._thrusters = []
+        self._positions = np.zeros((0, 2))
+        self._enabled = np.zeros(0, dtype=bool)
+        self._disabled = ()
+        self._scales = np.zeros(0)
+        self._rates = np.zeros((0, 2))
+        self._thrust = np.zeros((0, 2))
+        self._centres = (None, None)
+        self._rhs_version = 0
+
+        self._compiled = compiled
+        self._search = search
+        self._warm_start = warm_start
+        self._warn_infeasible = warn_infeasible
+        self._presolve = presolve
+        self._symmetry = symmetry
+        self._geometric_symmetries = None
+        self._symmetries = {}
+        self._ranges = None
+        self._backend = solver
+        self._problems = {}
+        self._warm = None
+        self._executor = None
+        self._owns_executor = False
+        self._workers = 1
+        self._stats_callback = None
+        self._result_cache = None
+        self._version = 0
+        self._compiled_constraints = {}
+        self._formulations = {}
+        self._signature = ()
 
         self.set_slack_coefficients()
 
@@ -38,6 +472,33 @@ class Allocator(ABC):
          problem formulation for penalty calculation.
         """
         self._slack_coefs = coefs
+        self._formulations.clear()
+        self._problems.clear()
+        self._symmetries.clear()
+        self._new_version()
+
+    def _new_version(self):
+        """
+        Bump the configuration version, dropping all
+         cached results.
+        """
+        self._version += 1
+        if self._result_cache is not None:
+            self._result_cache.clear()
+
+    @property
+    def backend(self):
+        """
+        Solver backend of this allocator.
+        """
+        return self._backend
+
+    @property
+    def thrusters(self):
+        """
+        Thrusters assigned to this allocation problem.
+        """
+        return tuple(self._thrusters)
 
     @property
     def n_thrusters(self):
@@ -68,87 +529,964 @@ class Allocator(ABC):
         """
         Problem formulation, to be overrided
          by child class.
+
+        The formulation is cached and only rebuilt when
+         thrusters or slack coefficients change.
         """
 
+    def _formulation(self, relax):
+        """
+        Cached problem formulation (G, a) together with the
+         formulation prepared by the solver backend.
+        """
+        formulation = self._formulations.get(relax)
+        if formulation is None:
+            G, a = self.problem_formulation(relax)
+            formulation = (G, a, self._backend.formulate(G, a))
+            self._formulations[relax] = formulation
+        return formulation
+
     def add_thruster(self, thruster):
         """
         Add a thruster to the allocation problem.
         """
         if isinstance(thruster, Thruster):
             self._thrusters.append(thruster)
+            self._positions = np.concatenate(
+                (self._positions, [[thruster.pos_x, thruster.pos_y]])
+            )
+            self._enabled = np.append(self._enabled, True)
+            self._scales = np.append(self._scales, 1.0)
+            self._thrust = np.concatenate((self._thrust, [thruster.thrust]))
+            self._invalidate()
         else:
             raise TypeError("Thruster is not of proper type!")
 
-    # pylint: disable=too-many-locals,invalid-name
+    def set_thruster_enabled(self, index, enabled=True):
+        """
+        Enable or disable the thruster with the given index, e.g.
+         when it trips. A disabled thruster is held at zero
+         thrust and its disjuncts are left out of the search,
+         its entry in the combinations is 0. Problem data
+         compiled for a set of disabled thrusters is kept, so
+         switching back and forth does not recompile.
+        """
+        enabled = bool(enabled)
+        if self._enabled[index] == enabled:
+            return
+
+        self._enabled[index] = enabled
+        self._disabled = tuple(int(i) for i in np.flatnonzero(~self._enabled))
+        self._symmetries.clear()
+        self._warm = None
+        self._new_version()
+
+    @property
+    def enabled_thrusters(self):
+        """
+        Whether each thruster is enabled, see set_thruster_enabled.
+        """
+        return tuple(bool(e) for e in self._enabled)
+
+    def set_thrust_scale(self, index, scale=1.0):
+        """
+        Scale the thrust capacity of the thruster with the given
+         index, e.g. for derating with speed or power limits. The
+         constraints of the thruster are scaled about the origin,
+         which only scales the right hand side of the compiled
+         constraints. The scale must be positive, see
+         set_thruster_enabled to take a thruster out of use.
+        """
+        scale = float(scale)
+        if not np.isfinite(scale) or scale <= 0:
+            raise ValueError("Thrust scale must be positive")
+        if self._scales[index] == scale:
+            return
+
+        self._scales[index] = scale
+        self._rhs_version += 1
+        if self._backend.rhs_in_prepare:
+            self._problems.clear()
+        self._new_version()
+
+    @property
+    def thrust_scales(self):
+        """
+        Thrust scale of each thruster, see set_thrust_scale.
+        """
+        return tuple(float(s) for s in self._scales)
+
+    def set_current_thrust(self, u):
+        """
+        Set the current thrust of all thrusters, given as in the
+         result of allocate, around which the rate limits of the
+         thrusters apply (see Thruster.set_rate_limit). allocate
+         sets it to the allocated thrust, use this method e.g. to
+         feed back the measured thrust instead.
+        """
+        self._thrust = np.array(u, dtype=float).reshape((-1, 2))
+        for t, u_t in zip(self._thrusters, self._thrust):
+            t.thrust = u_t
+
+        if not np.all(np.isnan(self._rates)):
+            self._rhs_version += 1
+            if self._backend.rhs_in_prepare:
+                self._problems.clear()
+            self._new_version()
+
+    def _rated(self):
+        """
+        Indices of the enabled thrusters with a rate limit
+        """
+        return np.flatnonzero(self._enabled & ~np.isnan(self._rates[:, 0]))
+
+    def _rate_centres(self):
+        """
+        Centres of the rate limit boxes, the current thrust of
+         each rated thruster projected onto its scaled constraints,
+         so that every box overlaps the thrust the thruster can
+         deliver also after derating or for a measured thrust
+         outside its constraints.
+        """
+        version, centres = self._centres
+        if version != self._rhs_version:
+            centres = self._thrust.copy()
+            for i in self._rated():
+                centres[i] = _project(
+                    self._thrust[i],
+                    [
+                        (C_t, b_t * self._scales[i], n_eq_t)
+                        for C_t, b_t, n_eq_t in map(
+                            self._thruster_constraints,
+                            self._thrusters[i].static_constraints(),
+                        )
+                    ],
+                )
+            self._centres = (self._rhs_version, centres)
+        return centres
+
+    def _rate_rhs(self, rated):
+        """
+        Right hand side of the rate limits of the rated thrusters,
+         see Thruster.dynamic_constraints
+        """
+        u = self._rate_centres()[rated]
+        rate = self._rates[rated]
+        return np.concatenate((u - rate, -u - rate), axis=1).ravel()
+
+    def _layout_signature(self):
+        return tuple((t.disjunctions, t.rate_limit) for t in self._thrusters)
+
+    def _invalidate(self):
+        """
+        Drop all compiled problem data, forcing
+         a rebuild on the next allocation.
+        """
+        self._compiled_constraints.clear()
+        self._problems.clear()
+        self._formulations.clear()
+        self._geometric_symmetries = None
+        self._symmetries.clear()
+        self._ranges = None
+        self._warm = None
+        self._signature = self._layout_signature()
+        self._rates = np.array(
+            [t.rate_limit or (np.nan, np.nan) for t in self._thrusters], dtype=float
+        ).reshape((-1, 2))
+        self._thrust = np.array(
+            [t.thrust for t in self._thrusters], dtype=float
+        ).reshape((-1, 2))
+        self._rhs_version += 1
+        self._new_version()
+
+    # pylint: disable=invalid-name
+    def compile_constraints(self, relax, combination):
+        """
+        Cached counterpart to assemble_constraints. The
+         constraint matrices are assembled once per
+         combination and the right hand side vector is
+         preallocated, only the first DOFS entries
+         (the global thrust) needs updating before use.
+        """
+        key = (relax, combination, self._disabled)
+        compiled = self._compiled_constraints.get(key)
+        if compiled is None:
+            C, b, n_eq, owner, rated = self._assemble(
+                np.zeros(DOFS), relax, combination
+            )
+            compiled = _CompiledConstraints(
+                np.ascontiguousarray(C.T), b, n_eq, owner, rated, None
+            )
+            self._compiled_constraints[key] = compiled
+
+        # Update the right hand side in place after a change of
+        # thrust scales or of the current thrust
+        if compiled.version != self._rhs_version:
+            n_static = DOFS + len(compiled.owner)
+            compiled.b[DOFS:n_static] = compiled.base * self._scales[compiled.owner]
+            compiled.b[n_static:] = self._rate_rhs(compiled.rated)
+            compiled.version = self._rhs_version
+
+        return compiled.C, compiled.b, compiled.n_eq
+
     def assemble_constraints(self, global_thrust, relax, combination):
         """
         Assemble linear constraints into matrix form
         """
-        C = np.zeros((DOFS, self.n_problem))
-        C[0, ::2] = 1
-        C[1, 1::2] = 1
-        C[2, ::2] = [-thruster.pos_y for thruster in self._thrusters]
-        C[2, 1::2] = [thruster.pos_x for thruster in self._thrusters]
+        C, b, n_eq, owner, _ = self._assemble(global_thrust, relax, combination)
+        b[DOFS : DOFS + len(owner)] *= self._scales[owner]
+        return C.T, b, n_eq
+
+    # pylint: disable=too-many-locals,invalid-name
+    def _assemble(self, global_thrust, relax, combination):
+        """
+        Constraints of the combination as (C, b, n_eq, owner, rated),
+         with C not yet transposed and the right hand side of the
+         thruster constraints unscaled. owner holds the index of
+         the thruster of each row following the first DOFS rows,
+         the rate limits of the thrusters rated follow last.
+        """
+        n_thrusters = self.n_thrusters
+        n = self.n_relaxed_problem if relax else self.n_problem
+        blocks = [
+            (i, constraints)
+            for i, (_, constraints) in enumerate(self._blocks(combination))
+            if constraints is not None
+        ]
+
+        # Row counts and offsets of the thruster constraints, the
+        # equalities are kept on top in the order of the thrusters
+        n_rows = np.array([len(c[1]) for _, c in blocks], dtype=int)
+        n_eqs = np.array([c[2] for _, c in blocks], dtype=int)
+        n_eq = DOFS + int(n_eqs.sum())
+        eq_offsets = DOFS + np.cumsum(n_eqs) - n_eqs
+        ineq_offsets = n_eq + np.cumsum(n_rows - n_eqs) - (n_rows - n_eqs)
+
+        rated = self._rated()
+        n_static = DOFS + int(n_rows.sum())
+        C = np.zeros((n_static + 4 * len(rated), n))
+        C[0, : 2 * n_thrusters : 2] = 1
+        C[1, 1 : 2 * n_thrusters : 2] = 1
+        C[2, : 2 * n_thrusters : 2] = -self._positions[:, 1]
+        C[2, 1 : 2 * n_thrusters : 2] = self._positions[:, 0]
 
         if relax:
             # Add slack variables
-            C = np.concatenate((C, np.eye(3)), axis=1)
+            C[:DOFS, -DOFS:] = np.eye(DOFS)
+
+        b = np.zeros(len(C))
+        b[:DOFS] = global_thrust
+        owner = np.zeros(n_static - DOFS, dtype=int)
+
+        if blocks:
+            C_t = np.concatenate([c[0] for _, c in blocks])
+            b_t = np.concatenate([c[1] for _, c in blocks])
+
+            # Destination row and column of every stacked thruster row
+            local = np.arange(len(b_t)) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows)
+            n_eq_t = np.repeat(n_eqs, n_rows)
+            rows = np.where(
+                local < n_eq_t,
+                np.repeat(eq_offsets, n_rows) + local,
+                np.repeat(ineq_offsets, n_rows) + local - n_eq_t,
+            )
+            cols = 2 * np.repeat([i for i, _ in blocks], n_rows)
+
+            C[rows, cols] = C_t[:, 0]
+            C[rows, cols + 1] = C_t[:, 1]
+            b[rows] = b_t
+            owner[rows - DOFS] = cols // 2
+
+        if len(rated):
+            # Rate limits, a box around the current thrust
+            rows = np.arange(n_static, len(C))
+            cols = 2 * np.repeat(rated, 4) + np.tile([0, 1, 0, 1], len(rated))
+            C[rows, cols] = np.tile([1.0, 1.0, -1.0, -1.0], len(rated))
+            b[n_static:] = self._rate_rhs(rated)
+
+        return C, b, n_eq, owner, rated
+
+    def _thruster_constraints(self, constraint):
+        if self._presolve:
+            return constraint.reduced_constraints
+        return constraint.constraints
+
+    def _constraints(self, query, combination):
+        if self._compiled:
+            C, b, n_eq = self.compile_constraints(query.relax, combination)
+            b[:DOFS] = query.global_thrust
+            return C, b, n_eq
+
+        return self.assemble_constraints(query.global_thrust, query.relax, combination)
+
+    def _thrust_range(self, combination):
+        """
+        Lower and upper bounds of the global thrust the thrusters
+         can produce with the combination, None entries denoting
+         relaxed thrusters.
+        """
+        if self._ranges is None:
+            self._ranges = [_thrust_ranges(t) for t in self._thrusters]
+
+        lower = np.zeros(DOFS)
+        upper = np.zeros(DOFS)
+        for ranges, disjunct, enabled, scale in zip(
+            self._ranges, combination, self._enabled, self._scales
+        ):
+            if not enabled:
+                continue
+            bounds = ranges[-1 if disjunct is None else disjunct]
+            lower += scale * bounds[0]
+            upper += scale * bounds[1]
+        return lower, upper
+
+    def _screen(self, query, combination):
+        """
+        Whether the combination is certainly infeasible without
+         slack variables, as the global thrust is outside the
+         range of the combination.
+        """
+        if query.relax:
+            return False
+
+        lower, upper = self._thrust_range(combination)
+        tol = SCREEN_TOLERANCE * (1 + np.abs(lower) + np.abs(upper))
+        global_thrust = query.global_thrust
+        if np.all(global_thrust >= lower - tol) and np.all(
+            global_thrust <= upper + tol
+        ):
+            return False
+
+        query.screened += 1
+        if None not in combination:
+            query.infeasible.append(combination)
+        if query.stats is not None:
+            query.stats.screened += 1
+        return True
 
-        n_eq = DOFS
-        b = np.array(global_thrust, dtype="float")
+    def _solve(self, query, combination):
+        """
+        Solve the QP for a single combination, a None entry in
+         the combination denotes a relaxed thruster. Returns None
+         if the problem is infeasible.
+        """
+        if self._screen(query, combination):
+            return None
+
+        query.solves += 1
+        stats = query.stats
+        if stats is None:
+            res = self._solve_qp(query, combination)
+            if res is None and None not in combination:
+                query.infeasible.append(combination)
+            return res
+
+        t0 = time.perf_counter()
+        C, b, n_eq = self._constraints(query, combination)
+        problem = self._problem(query, combination, C)
+        t1 = time.perf_counter()
+        stats.assembly_time += t1 - t0
+
+        res = self._backend.solve(problem, C, b, n_eq)
+        if res.status != OPTIMAL:
+            res = None
+            if None not in combination:
+                query.infeasible.append(combination)
 
+        stats.record(res, time.perf_counter() - t1)
+        return res
+
+    def _solve_qp(self, query, combination):
+        C, b, n_eq = self._constraints(query, combination)
+        res = self._backend.solve(self._problem(query, combination, C), C, b, n_eq)
+        return res if res.status == OPTIMAL else None
+
+    def _blocks(self, combination, scaled=False):
+        """
+        Constraints of the combination per thruster, as given
+         to SolverBackend.prepare when scaled by the thrust
+         scales and including the rate limits.
+        """
+        blocks = []
         for i, tup in enumerate(zip(self._thrusters, combination)):
             t, disjunct = tup
-            C_t, b_t, n_eq_t = t.static_constraints()[disjunct].constraints
-            C_t = pad_constraints(C_t, i * 2, C.shape[1])
-            C, b, n_eq = concatenate_constraints((C, b, n_eq), (C_t, b_t, n_eq_t))
+            if not self._enabled[i]:
+                blocks.append(((2 * i, 2 * i + 1), _DISABLED))
+                continue
+            if disjunct is None:
+                constraint = t.relaxed_constraint()
+            else:
+                constraint = t.static_constraints()[disjunct]
+            constraints = (
+                None if constraint is None else self._thruster_constraints(constraint)
+            )
+            if scaled and constraints is not None and self._scales[i] != 1:
+                C_t, b_t, n_eq_t = constraints
+                constraints = (C_t, b_t * self._scales[i], n_eq_t)
+            rate = t.dynamic_constraints(self._rate_centres()[i]) if scaled else None
+            if rate is not None:
+                constraints = (
+                    rate
+                    if constraints is None
+                    else concatenate_constraints(constraints, rate)
+                )
+            blocks.append(((2 * i, 2 * i + 1), constraints))
+        return blocks
 
-        return C.T, b, n_eq
+    # pylint: disable=invalid-name
+    def _problem(self, query, combination, C):
+        """
+        Problem of the combination prepared by the solver
+         backend, cached along with the compiled constraints.
+        """
+        key = (query.relax, combination, self._disabled)
+        problem = self._problems.get(key) if self._compiled else None
+        if problem is None:
+            problem = self._backend.prepare(
+                query.formulation, C, DOFS, self._blocks(combination, scaled=True)
+            )
+            if self._compiled:
+                self._problems[key] = problem
+        return problem
 
-    # pylint: disable=too-many-locals,invalid-name
-    def allocate(self, global_thrust, relax=True):
+    def _parallel_solve(self, query, combinations):
         """
-        Allocate global thrust vector to available thrusters
+        Solve the combinations in chunks on the executor, yielding
+         the results in the original order of the combinations.
         """
+        t0 = time.perf_counter()
+        problems = []
+        for combination in combinations:
+            if self._screen(query, combination):
+                continue
+            C, b, n_eq = self._constraints(query, combination)
+            problem = self._problem(query, combination, C)
+            problems.append((combination, problem, C, b, n_eq))
+        t1 = time.perf_counter()
 
-        if self.n_problem == 0:
-            raise AllocationError(
-                """At least one thruster must be added
-            to the allocator-object before attempting an allocation!"""
+        size = max(1, -(-len(problems) // self._workers))
+        futures = [
+            self._executor.submit(_solve_chunk, self._backend, problems[i : i + size])
+            for i in range(0, len(problems), size)
+        ]
+
+        for future in futures:
+            results = future.result()
+
+            if query.stats is not None:
+                # Wall time spent waiting is attributed to solving
+                t2 = time.perf_counter()
+                query.stats.assembly_time += t1 - t0
+                for _, res in results:
+                    query.stats.record(res, 0.0)
+                query.stats.solve_time += t2 - t1
+                t0 = t1 = t2
+
+            for combination, res in results:
+                if res is None:
+                    query.infeasible.append(combination)
+                yield combination, res
+
+    def set_executor(self, executor=None, workers=None):
+        """
+        Set a concurrent.futures executor on which the combinations
+         of the exhaustive search are solved, split into one chunk
+         per worker. If only the number of workers is given, a
+         process pool owned by this allocator is created. The
+         winning combination is the same as for a serial search.
+
+        Call without arguments to return to serial evaluation.
+        """
+        if self._owns_executor:
+            self._executor.shutdown()
+
+        self._owns_executor = executor is None and workers is not None
+        if self._owns_executor:
+            executor = ProcessPoolExecutor(max_workers=workers)
+
+        self._executor = executor
+        self._workers = workers or os.cpu_count() or 1
+
+    def _solve_warm(self, query):
+        """
+        Solve the winning combination of the previous allocation,
+         first by assuming the previous active set.
+        """
+        warm_relax, combination, active = self._warm
+        if warm_relax != query.relax:
+            return None
+
+        t0 = time.perf_counter()
+        constraints = self._constraints(query, combination)
+        res = _solve_active_set(query.G, query.a, constraints, active - 1)
+        if query.stats is not None and res is not None:
+            query.stats.record(res, time.perf_counter() - t0)
+        if res is None:
+            res = self._solve(query, combination)
+
+        return None if res is None else (combination, res)
+
+    def _heuristic_order(self, query, disjuncts):
+        """
+        Yield the combinations ordered by how well they fit the
+         solution of the problem with every thruster relaxed to
+         the convex hull of its disjuncts. The relaxation is only
+         solved if it leaves budget for at least one combination.
+        """
+        root = tuple(None if len(d) > 1 else 0 for d in disjuncts)
+
+        # Without relaxed thrusters the root is the only combination,
+        # and a last solve is better spent on a combination
+        spare = query.max_solves is None or query.max_solves - query.solves > 1
+        if None in root and spare and not query.out_of_budget():
+            res = self._solve(query, root)
+            if res is not None:
+                yield from self._fit_order(res, disjuncts)
+                return
+
+        yield from itertools.product(*disjuncts)
+
+    def _fit_order(self, res, disjuncts):
+        """
+        Yield the combinations ordered by how well the disjuncts fit
+         the thrust of the solution res. A disjunct is scored by its
+         largest constraint violation, the combinations by the sum
+         of the scores of their disjuncts.
+        """
+        total = np.zeros(())
+        thrust = res[0][: self.n_problem].reshape((-1, 2))
+        for t, u, d, scale in zip(self._thrusters, thrust, disjuncts, self._scales):
+            scores = np.zeros(len(d))
+            for k in d:
+                C, b, n_eq = t.static_constraints()[k].constraints
+                violation = scale * b - C @ u
+                violation[:n_eq] = np.abs(violation[:n_eq])
+                scores[k] = max(np.max(violation, initial=0), 0)
+            total = np.add.outer(total, scores)
+
+        order = np.argsort(total, axis=None, kind="stable")
+        for index in zip(*np.unravel_index(order, total.shape)):
+            yield tuple(int(i) for i in index)
+
+    def _dive(self, query, res, disjuncts):
+        """
+        Solve the combination best fitting the relaxed solution res,
+         an early incumbent for a bounded branch and bound search.
+        """
+        if query.out_of_budget():
+            return None
+        combination = next(self._fit_order(res, disjuncts))
+        res = self._solve(query, combination)
+        return None if res is None else (combination, res)
+
+    def layout_symmetries(self, relax=True):
+        """
+        Symmetries of the thruster layout that also leave the
+         objective of the problem formulation and the thrust
+         scales invariant, as a list of quta.symmetry.Symmetry.
+        """
+        symmetries = self._symmetries.get(relax)
+        if symmetries is None:
+            if self._geometric_symmetries is None:
+                self._geometric_symmetries = find_symmetries(self._thrusters)
+            G, a, _ = self._formulation(relax)
+            symmetries = []
+            # Rate limits depend on the current thrust, not the layout
+            candidates = []
+            if np.all(np.isnan(self._rates)):
+                candidates = self._geometric_symmetries
+            for symmetry in candidates:
+                # Disabled thrusters must be mapped onto disabled thrusters
+                if any(
+                    self._enabled[symmetry.permutation[i]]
+                    or symmetry.disjuncts[i][0] != 0
+                    for i in self._disabled
+                ):
+                    continue
+                P = symmetry.variable_map(len(a))
+                if np.allclose(P.T @ G @ P, G) and np.allclose(P.T @ a, a):
+                    symmetries.append(symmetry)
+            self._symmetries[relax] = symmetries
+
+        # Thrust scales change often, filter on lookup
+        return [
+            s
+            for s in symmetries
+            if np.array_equal(self._scales[list(s.permutation)], self._scales)
+        ]
+
+    def _invariant_symmetries(self, query, disjuncts):
+        """
+        Symmetries leaving the global thrust of the query
+         invariant, none if there is a single combination
+        """
+        if not self._symmetry or all(len(d) == 1 for d in disjuncts):
+            return []
+        return [
+            s
+            for s in self.layout_symmetries(query.relax)
+            if s.invariant(query.global_thrust)
+        ]
+
+    def _proven_optimal(self, query, disjuncts, incumbent):
+        """
+        Whether the incumbent attains the lower bound given by
+         the problem with every thruster relaxed to the convex
+         hull of its disjuncts, and thus is optimal.
+        """
+        root = tuple(None if len(d) > 1 else 0 for d in disjuncts)
+        if None not in root:
+            return True
+        if query.out_of_budget():
+            return False
+        res = self._solve(query, root)
+        if res is None:
+            return False
+        objective = incumbent[1][1]
+        return res[1] >= objective - BOUND_TOLERANCE * max(1, abs(objective))
+
+    # pylint: disable=too-many-branches
+    def _exhaustive_search(self, query, disjuncts, incumbent):
+        results = {}
+        if incumbent is not None:
+            if self._proven_optimal(query, disjuncts, incumbent):
+                return incumbent
+            results[incumbent[1][1]] = incumbent
+
+        if query.budgeted:
+            combinations = self._heuristic_order(query, disjuncts)
+        else:
+            combinations = itertools.product(*disjuncts)
+        if incumbent is not None:
+            combinations = (c for c in combinations if c != incumbent[0])
+
+        # Mirrored combinations share the objective, solve one of each orbit
+        symmetries = self._invariant_symmetries(query, disjuncts)
+        if symmetries:
+            combinations = (c for c in combinations if c == min(_orbit(c, symmetries)))
+
+        if query.budgeted:
+            combinations = itertools.takewhile(
+                lambda _: not query.out_of_budget(), combinations
             )
+            solved = ((c, self._solve(query, c)) for c in combinations)
+        elif self._executor is None:
+            solved = ((c, self._solve(query, c)) for c in combinations)
+        else:
+            solved = self._parallel_solve(query, combinations)
+
+        for combination, res in solved:
+            if res is not None:
+                results[res[1]] = (combination, res)
+
+        if symmetries:
+            query.infeasible = [
+                image
+                for combination in query.infeasible
+                for image in sorted(_orbit(combination, symmetries))
+            ]
+
+        if not results:
+            return None
+
+        return results[min(results.keys())]
+
+    def _branch_and_bound_search(self, query, disjuncts, incumbent):
+        """
+        Depth first branch and bound over the disjunct combinations.
+         Thrusters not yet branched on are relaxed to the convex
+         hull of their disjuncts, the solution of which is a lower
+         bound for all combinations in that subtree.
+        """
+        best = incumbent
+
+        def pruned(bound):
+            if best is None:
+                return False
+            objective = best[1][1]
+            return bound >= objective - BOUND_TOLERANCE * max(1, abs(objective))
+
+        root = tuple(None if len(d) > 1 else 0 for d in disjuncts)
+        res = None if query.out_of_budget() else self._solve(query, root)
+        stack = [] if res is None else [(root, res)]
+
+        if stack and best is None and query.budgeted and None in root:
+            best = self._dive(query, res, disjuncts)
+
+        while stack:
+            node, res = stack.pop()
+
+            if pruned(res[1]):
+                continue
+
+            if None not in node:
+                best = (node, res)
+                continue
+
+            if query.out_of_budget():
+                stack.append((node, res))
+                break
+
+            # Branch on the first relaxed thruster
+            i = node.index(None)
+            children = []
+            for disjunct in disjuncts[i]:
+                if query.out_of_budget():
+                    break
+                child = node[:i] + (disjunct,) + node[i + 1 :]
+                res = self._solve(query, child)
+                if res is not None and not pruned(res[1]):
+                    children.append((child, res))
 
-        G, a = self.problem_formulation(relax)
+            # Most promising child on top of the stack
+            children.sort(key=lambda c: c[1][1], reverse=True)
+            stack.extend(children)
+
+        if not query.exhaustive:
+            # Out of budget, leaves already solved are feasible allocations
+            for node, res in stack:
+                if None not in node and not pruned(res[1]):
+                    best = (node, res)
+
+        return best
+
+    def _disjuncts(self):
+        if self.n_problem == 0:
+            raise AllocationError("""At least one thruster must be added
+            to the allocator-object before attempting an allocation!""")
 
         disjuncts = []
         for t in self._thrusters:
             disjuncts.append(range(t.disjunctions))
 
-        results = {}
-        for combination in itertools.product(*disjuncts):
-
-            C, b, n_eq = self.assemble_constraints(global_thrust, relax, combination)
-
-            try:
-                res = quadprog.solve_qp(
-                    G, a, C, b, n_eq
-                )  # pylint: disable=c-extension-no-member
-                results[res[1]] = res
-            except ValueError:
-                warn_str = """This constraint combination has no solution:
-                {}""".format(
-                    combination
-                )
-                warnings.warn(warn_str, UserWarning)
+        # Constraints or rate limits set directly on a thruster
+        # change the signature
+        if self._layout_signature() != self._signature:
+            self._invalidate()
 
-        if not results:
+        for i in self._disabled:
+            disjuncts[i] = range(1)
+
+        return disjuncts
+
+    def _allocate(self, query, disjuncts):
+        incumbent = None
+        if self._warm_start and self._warm is not None:
+            incumbent = self._solve_warm(query)
+
+        if self._search == "branch_and_bound":
+            search = self._branch_and_bound_search
+        else:
+            search = self._exhaustive_search
+
+        best = search(query, disjuncts, incumbent)
+
+        if self._warn_infeasible:
+            for combination in query.infeasible:
+                _warn_infeasible(combination)
+
+        if best is not None:
+            combination, res = best
+            if self._warm_start:
+                self._warm = (query.relax, combination, res[5])
+            if query.stats is not None:
+                query.stats.combination = combination
+                query.stats.active = res[5]
+
+        return best
+
+    def _hit(self, relax, best, stats):
+        """
+        Book keeping of an allocation served from the cache
+        """
+        combination, res = best
+        if self._warm_start:
+            self._warm = (relax, combination, res[5])
+        if stats is not None:
+            stats.combination = combination
+            stats.active = res[5]
+
+    def set_stats_callback(self, callback=None):
+        """
+        Set a callback receiving an AllocationStats object
+         after every call to allocate, also for allocations
+         without solution. See quta.instrumentation.StatsRecorder
+         for aggregation over long runs.
+
+        Call without arguments to disable instrumentation.
+        """
+        self._stats_callback = callback
+
+    def set_result_cache(self, resolution=None, maxsize=1024):
+        """
+        Cache the results of allocate, keyed on the global thrust
+         quantized to resolution (scalar or per [Fx, Fy, Mz]),
+         relax and the configuration of the allocator. Setpoints
+         within the same cell share the allocation of the first
+         of them. At most maxsize results are kept, the least
+         recently used are evicted first. Bounded searches (with
+         a time_budget or max_solves) bypass the cache. Results
+         served from the cache are shared between calls and
+         read-only, the returned thrust is a private copy.
+
+        The cache is dropped whenever thrusters, their
+         constraints or the slack coefficients change. See
+         cache_info for hit and miss statistics.
+
+        Call without arguments to disable caching.
+        """
+        self._result_cache = (
+            None if resolution is None else _ResultCache(resolution, maxsize)
+        )
+
+    def cache_info(self):
+        """
+        Statistics of the result cache as a CacheInfo
+         (hits, misses, maxsize, currsize), or None if
+         caching is disabled.
+        """
+        return None if self._result_cache is None else self._result_cache.info()
+
+    # pylint: disable=too-many-arguments
+    def allocate(
+        self,
+        global_thrust,
+        relax=True,
+        diagnostics=False,
+        time_budget=None,
+        max_solves=None,
+    ):
+        """
+        Allocate global thrust vector to available thrusters
+
+        Returns the allocated thrust and the raw solver result.
+         With diagnostics=True an AllocationDiagnostics object,
+         listing the infeasible combinations, is returned as a
+         third element.
+
+        The search is bounded by time_budget [s] and/or
+         max_solves (number of QPs), checked before each QP.
+         The best allocation found within the budget is
+         returned, diagnostics.exhaustive tells whether it is
+         the optimum. A bounded search is always serial.
+        """
+        callback = self._stats_callback
+        stats = None if callback is None else AllocationStats()
+        t0 = time.perf_counter()
+
+        disjuncts = self._disjuncts()
+
+        cache = self._result_cache
+        key = None
+        if cache is not None and time_budget is None and max_solves is None:
+            key = cache.key(global_thrust, relax, self._version)
+        entry = None if key is None else cache.get(key)
+
+        if entry is None:
+            G, a, formulation = self._formulation(relax)
+            query = _Query(
+                G, a, global_thrust, relax, formulation=formulation, stats=stats
+            )
+            if time_budget is not None:
+                query.deadline = t0 + time_budget
+            query.max_solves = max_solves
+            best = self._allocate(query, disjuncts)
+            report = AllocationDiagnostics(query.infeasible, query.exhaustive)
+            if key is not None:
+                cache.put(key, (best, report))
+        else:
+            best, report = entry
+            if best is not None:
+                self._hit(relax, best, stats)
+
+        if stats is not None:
+            stats.total_time = time.perf_counter() - t0
+            callback(stats)
+
+        if best is None:
+            if not report.exhaustive:
+                raise AllocationError(
+                    "No solution was found within the budget!", report
+                )
             raise AllocationError(
                 """This problem has no solution!
-            Try adding slack variables by setting relax=True"""
+            Try adding slack variables by setting relax=True""",
+                report,
             )
 
-        res = results[min(results.keys())]
+        _, res = best
+        u = res[0][: self.n_problem]
+        if entry is not None:
+            u = u.copy()
+        if len(self._rated()):
+            self.set_current_thrust(u)
+        if diagnostics:
+            return u, res, report
+        return u, res
+
+    # pylint: disable=too-many-locals,invalid-name
+    def allocate_many(self, global_thrusts, relax=True):
+        """
+        Allocate a batch of global thrust vectors, given as an
+         array of shape (N, 3). The compiled constraints are
+         shared by the whole batch.
+
+        Returns a tuple of arrays (u, objective, slack) with shapes
+         (N, n_problem), (N,) and (N, 3). Rows without solution
+         are filled with nan instead of raising AllocationError.
+         Rate limits apply around the current thrust for every
+         row, which is not updated.
+        """
+        global_thrusts = np.atleast_2d(np.asarray(global_thrusts, dtype=float))
+        if global_thrusts.ndim != 2 or global_thrusts.shape[1] != DOFS:
+            raise ValueError("Global thrusts must be of shape (N, {})".format(DOFS))
+
+        disjuncts = self._disjuncts()
+
+        G, a, formulation = self._formulation(relax)
+        query = _Query(G, a, None, relax, formulation=formulation)
+
+        N = len(global_thrusts)
+        x = np.full((N, len(a)), np.nan)
+        objective = np.full(N, np.inf)
+
+        if self._search == "exhaustive" and self._compiled:
+            # Tight loop, setpoints innermost to reuse each compiled problem
+            for combination in itertools.product(*disjuncts):
+                C, b, n_eq = self.compile_constraints(relax, combination)
+                problem = self._problem(query, combination, C)
+                candidates = range(N)
+                if not relax:
+                    lower, upper = self._thrust_range(combination)
+                    tol = SCREEN_TOLERANCE * (1 + np.abs(lower) + np.abs(upper))
+                    candidates = np.flatnonzero(
+                        np.all(global_thrusts >= lower - tol, axis=1)
+                        & np.all(global_thrusts <= upper + tol, axis=1)
+                    )
+                for i in candidates:
+                    b[:DOFS] = global_thrusts[i]
+                    res = self._backend.solve(problem, C, b, n_eq)
+                    if res.status != OPTIMAL:
+                        continue
+                    if res[1] <= objective[i]:
+                        objective[i] = res[1]
+                        x[i] = res[0]
+        else:
+            for i, global_thrust in enumerate(global_thrusts):
+                query.global_thrust = global_thrust
+                best = self._allocate(query, disjuncts)
+                if best is not None:
+                    objective[i] = best[1][1]
+                    x[i] = best[1][0]
+
+        objective[np.isinf(objective)] = np.nan
+
+        if relax:
+            slack = x[:, self.n_problem :]
+        else:
+            slack = np.where(np.isnan(objective)[:, None], np.nan, np.zeros((N, DOFS)))
 
-        return res[0][: self.n_problem], res
+        return x[:, : self.n_problem], objective, slack
 
 
 class MinimizePowerAllocator(Allocator):
@@ -0,0 +1,269 @@
+"""
+Benchmark suite for the allocation solver
+
+Sweeps the number of azimuthing thrusters, the polygon
+resolution of their constraints and the number of disjunct
+sectors per thruster. Reports latency percentiles of
+Allocator.allocate together with the time split between
+constraint assembly and QP solving, as recorded by the
+allocator instrumentation.
+
+Run as:
+
+    python -m quta.bench --output bench.json
+
+Give several solver backends to compare them on the same
+configurations:
+
+    python -m quta.bench --solver quadprog diagonal
+"""
+
+import sys
+import json
+import time
+import argparse
+import platform
+import warnings
+
+import numpy as np
+
+from quta.thruster import Thruster
+from quta.allocator import AllocationError, MinimizePowerAllocator
+from quta.constraints import CircleConstraint, SectorConstraint
+
+MAX_FORCE = 1000
+
+BASELINE = {"n_thrusters": 3, "edges": 16, "disjuncts": 1}
+
+SWEEPS = {
+    "n_thrusters": [2, 4, 6, 8],
+    "edges": [8, 16, 32, 64],
+    "disjuncts": [1, 2, 3, 4],
+}
+
+
+def build_allocator(n_thrusters, edges, disjuncts, **kwargs):
+    """
+    Build an allocator with n_thrusters azimuthing thrusters
+     evenly spread along an ellipse, each thruster having
+     its full circle split into the given number of disjunct
+     sectors (or a single CircleConstraint).
+    """
+    allocator = MinimizePowerAllocator(**kwargs)
+
+    for angle in np.linspace(0, 2 * np.pi, n_thrusters, endpoint=False):
+        thruster = Thruster((20 * np.cos(angle), 5 * np.sin(angle)))
+
+        if disjuncts == 1:
+            thruster.add_constraint(CircleConstraint(MAX_FORCE, edges))
+        else:
+            width = 2 * np.pi / disjuncts
+            # SectorConstraint uses ceil(delta * pi / 2 * edges) arc edges,
+            # scale to get the same total resolution as the full circle
+            sector_edges = edges / disjuncts / (width * np.pi / 2)
+            for k in range(disjuncts):
+                start = angle + k * width
+                thruster.add_constraint(
+                    SectorConstraint(MAX_FORCE, start, start + width, sector_edges)
+                )
+
+        allocator.add_thruster(thruster)
+
+    return allocator
+
+
+def setpoints(allocator, n, seed=0):
+    """
+    Random global thrust setpoints of a magnitude the
+     allocator can mostly deliver.
+    """
+    rng = np.random.default_rng(seed)
+    scale = 0.5 * MAX_FORCE * allocator.n_thrusters
+    return rng.uniform(-1, 1, size=(n, 3)) * [scale, scale, 10 * scale]
+
+
+def _percentiles(samples):
+    samples = np.asarray(samples)
+    return {
+        "p50": float(np.percentile(samples, 50)),
+        "p99": float(np.percentile(samples, 99)),
+        "max": float(np.max(samples)),
+    }
+
+
+def _allocate(allocator, global_thrust, relax):
+    try:
+        allocator.allocate(global_thrust, relax)
+    except AllocationError:
+        pass
+
+
+def benchmark(allocator, thrusts, relax=True):
+    """
+    Benchmark a single allocator configuration, returns a
+     dict of latency statistics in seconds.
+
+    Latencies are measured without instrumentation, the
+     split between assembly and solve time together with
+     the number of QPs and iterations are taken from a
+     second, instrumented, pass.
+    """
+    # Warm up compiled caches
+    _allocate(allocator, thrusts[0], relax)
+
+    latencies = []
+    for global_thrust in thrusts:
+        t0 = time.perf_counter()
+        _allocate(allocator, global_thrust, relax)
+        latencies.append(time.perf_counter() - t0)
+
+    stats = []
+    allocator.set_stats_callback(stats.append)
+    for global_thrust in thrusts:
+        _allocate(allocator, global_thrust, relax)
+    allocator.set_stats_callback()
+
+    result = {"latency": _percentiles(latencies)}
+    for field in ("assembly_time", "solve_time", "evaluated", "iterations"):
+        result[field] = _percentiles([getattr(s, field) for s in stats])
+
+    return result
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def run(
+    repeats=100, relax=True, seed=0, compiled=True, solvers=("quadprog",), **kwargs
+):
+    """
+    Run all sweeps, each varying one parameter from the
+     baseline configuration, once per solver backend.
+     Returns a list of result dicts.
+    """
+    results = []
+    for sweep, values in SWEEPS.items():
+        for value in values:
+            config = dict(BASELINE, **{sweep: value})
+            for solver in solvers:
+                allocator = build_allocator(
+                    **config, compiled=compiled, solver=solver, **kwargs
+                )
+                combinations = int(
+                    np.prod([t.disjunctions for t in allocator.thrusters])
+                )
+
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    thrusts = setpoints(allocator, repeats, seed)
+                    stats = benchmark(allocator, thrusts, relax)
+
+                results.append(
+                    dict(
+                        config,
+                        sweep=sweep,
+                        solver=solver,
+                        combinations=combinations,
+                        **stats
+                    )
+                )
+
+    return results
+
+
+def _report(results, stream):
+    header = "{:<12} {:<9} {:>4} {:>5} {:>4} {:>6}" + " {:>10}" * 6
+    row = "{:<12} {:<9} {:>4} {:>5} {:>4} {:>6}" + " {:>10.3f}" * 5 + " {:>10.0f}"
+    print(
+        header.format(
+            "sweep",
+            "solver",
+            "n",
+            "edges",
+            "disj",
+            "comb",
+            "p50",
+            "p99",
+            "max",
+            "assembly",
+            "solve",
+            "QPs",
+        ),
+        file=stream,
+    )
+    for r in results:
+        print(
+            row.format(
+                r["sweep"],
+                r["solver"],
+                r["n_thrusters"],
+                r["edges"],
+                r["disjuncts"],
+                r["combinations"],
+                1e3 * r["latency"]["p50"],
+                1e3 * r["latency"]["p99"],
+                1e3 * r["latency"]["max"],
+                1e3 * r["assembly_time"]["p50"],
+                1e3 * r["solve_time"]["p50"],
+                r["evaluated"]["p50"],
+            ),
+            file=stream,
+        )
+    print("(all times in ms, assembly, solve and QPs are p50)", file=stream)
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split("\n", maxsplit=1)[0]
+    )
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-relax", dest="relax", action="store_false")
+    parser.add_argument("--no-compile", dest="compiled", action="store_false")
+    parser.add_argument(
+        "--search", choices=MinimizePowerAllocator.SEARCH_METHODS, default="exhaustive"
+    )
+    parser.add_argument(
+        "--solver",
+        nargs="+",
+        choices=MinimizePowerAllocator.SOLVERS,
+        default=["quadprog"],
+        help="Solver backends to compare",
+    )
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.repeats,
+        args.relax,
+        args.seed,
+        args.compiled,
+        args.solver,
+        search=args.search,
+    )
+
+    _report(results, sys.stdout)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "repeats": args.repeats,
+                    "relax": args.relax,
+                    "compiled": args.compiled,
+                    "search": args.search,
+                    "solvers": args.solver,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,9 @@ constraints for some simple geometries
 All linearized constrains returned to be compatible
 with quadprog format: C.T x >= b
 """
+
 import math
+from functools import lru_cache
 from abc import ABC, abstractmethod
 import numpy as np
 
@@ -76,8 +78,183 @@ def pad_constraints(C, pad_with_before, total_size, pad_value=0):
     return C_out
 
 
-def _point_on_circle(angle, radius):
-    return radius * np.cos(angle), radius * np.sin(angle)
+# pylint: disable=too-many-locals
+def constraint_vertices(C, b, n_eq=0, tol=1e-9):
+    """
+    Method for enumerating the vertices of a bounded set
+     of linear constraints in the plane, C x >= b where the
+     first n_eq constraints are equalities. Returns the
+     vertices in counter-clockwise order as an array of
+     shape (n, 2), a single vertex for a point and two for
+     a line segment. The array is empty if the set is empty.
+    """
+    C = np.asarray(C, dtype=float)
+    b = np.asarray(b, dtype=float)
+
+    norms = np.linalg.norm(C, axis=1)
+    norms[norms == 0] = 1
+    C = C / norms[:, None]
+    b = b / norms
+
+    i, j = np.triu_indices(len(b), 1)
+    A = np.stack((C[i], C[j]), axis=1)
+    det = np.linalg.det(A)
+    regular = np.abs(det) > tol
+    rhs = np.stack((b[i], b[j]), axis=1)[regular]
+    points = np.linalg.solve(A[regular], rhs[:, :, None])[:, :, 0]
+
+    eps = tol * (1 + np.max(np.abs(b), initial=0) + np.max(np.abs(points), initial=0))
+    residual = points @ C.T - b
+    feasible = np.all(residual[:, n_eq:] >= -eps, axis=1) & np.all(
+        np.abs(residual[:, :n_eq]) <= eps, axis=1
+    )
+
+    # Merge intersections of more than two lines in the same point
+    points = points[feasible]
+    _, unique = np.unique(np.round(points / eps), axis=0, return_index=True)
+
+    return convex_hull(points[np.sort(unique)])
+
+
+def _bounded(C, n_eq=0, tol=1e-9):
+    """
+    Whether a non-empty set of linear constraints in the plane,
+     on the same form as for constraint_vertices, is bounded.
+     That is if the normals, equalities counted in both
+     directions, positively span the plane, i.e. no angular gap
+     between consecutive normals is pi or more.
+    """
+    C = np.asarray(C, dtype=float)
+    C = np.concatenate((C, -C[:n_eq]))
+    C = C[np.linalg.norm(C, axis=1) > tol]
+    if len(C) < 3:
+        return False
+
+    angles = np.sort(np.arctan2(C[:, 1], C[:, 0]))
+    gaps = np.diff(np.append(angles, angles[0] + 2 * np.pi))
+    return np.max(gaps) < np.pi - tol
+
+
+# pylint: disable=too-many-locals
+def presolve_constraints(C, b, n_eq=0, tol=1e-9):
+    """
+    Method for removing redundant rows from a bounded set of
+     linear constraints in the plane, on the same form as for
+     constraint_vertices. Of the inequalities, only the first
+     defining each edge of a polygon, or each end point of a
+     line segment given by an equality, is kept. Other sets,
+     unbounded ones in particular, are returned unchanged, as
+     are sets without redundancy.
+    """
+    if not _bounded(C, n_eq, tol):
+        return C, b, n_eq
+
+    vertices = constraint_vertices(C, b, n_eq, tol)
+    dim = min(len(vertices) - 1, 2)
+    if dim < 1 or (dim == 1 and n_eq == 0):
+        return C, b, n_eq
+
+    norms = np.linalg.norm(C, axis=1)
+    norms[norms == 0] = 1
+    eps = tol * (1 + np.max(np.abs(b / norms)) + np.max(np.abs(vertices)))
+    tight = np.abs(C @ vertices.T - b[:, None]) <= eps * norms[:, None]
+
+    # Inequalities parallel to a line segment cannot bound it
+    if dim == 1:
+        direction = vertices[1] - vertices[0]
+        cutting = np.abs(C @ direction) > eps * norms * np.linalg.norm(direction)
+    else:
+        cutting = np.ones(len(b), dtype=bool)
+
+    keep = list(range(n_eq))
+    defined = set()
+    for i in range(n_eq, len(b)):
+        key = tuple(np.flatnonzero(tight[i]))
+        if len(key) >= dim and cutting[i] and key not in defined:
+            defined.add(key)
+            keep.append(i)
+
+    if len(keep) == len(b):
+        return C, b, n_eq
+
+    return _read_only(C[keep], b[keep]) + (n_eq,)
+
+
+def _points_on_circle(angles, radius):
+    return radius * np.column_stack((np.cos(angles), np.sin(angles)))
+
+
+def _half_planes(points):
+    """
+    Linearized constraints (C, b) for the convex polygon spanned
+     by points in counter-clockwise order, on quadprog format.
+    """
+    points = np.asarray(points, dtype=float)
+    x0, y0 = np.roll(points, 1, axis=0).T
+    x1, y1 = points.T
+
+    C = np.column_stack((y0 - y1, x1 - x0))
+    b = x1 * y0 - x0 * y1
+
+    return C, b
+
+
+def _read_only(*arrays):
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+
+@lru_cache(maxsize=1024)
+def _arc_polygon(radius, edges, start, delta):
+    """
+    Boundary points and linearized constraints of a full circle
+     (delta = 2 pi) or a circle sector. Cached, so that constraints
+     of identical geometry share the same read-only arrays.
+    """
+    if delta >= 2 * np.pi:
+        points = _points_on_circle(np.arange(edges) * (delta / edges) + start, radius)
+    else:
+        n = math.ceil(delta / 2 * np.pi * edges)
+        points = np.concatenate(
+            (
+                np.zeros((1, 2)),  # Origin
+                _points_on_circle(np.arange(n + 1) * (delta / n) + start, radius),
+            )
+        )
+
+    return _read_only(points, *_half_planes(points))
+
+
+def _cross(o, p, q):
+    return (p[0] - o[0]) * (q[1] - o[1]) - (p[1] - o[1]) * (q[0] - o[0])
+
+
+def convex_hull(points):
+    """
+    Method for calculating the convex hull of a set of
+     points in the plane (Andrew's monotone chain).
+     Returns the hull vertices in counter-clockwise
+     order as an array of shape (n, 2).
+    """
+    points = sorted(set(map(tuple, np.asarray(points, dtype=float))))
+
+    if len(points) < 3:
+        return np.array(points).reshape((-1, 2))
+
+    lower = []
+    for p in points:
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+
+    upper = []
+    for p in reversed(points):
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+
+    return np.array(lower[:-1] + upper[:-1])
 
 
 #
@@ -86,6 +263,7 @@ def _point_on_circle(angle, radius):
 #### Base constraint class ####
 #
 
+
 # pylint: disable=too-few-public-methods
 class Constraint(ABC):
     """
@@ -96,6 +274,7 @@ class Constraint(ABC):
     def __init__(self):
 
         self._C, self._b, self._n = self._linearized_constraint()
+        self._reduced = None
 
     @abstractmethod
     def _linearized_constraint(self):
@@ -110,6 +289,24 @@ class Constraint(ABC):
         """
         return self._C, self._b, self._n
 
+    @property
+    def reduced_constraints(self):
+        """
+        Constraints in matrix and vector form without
+         redundant rows, see presolve_constraints.
+        """
+        if self._reduced is None:
+            self._reduced = presolve_constraints(self._C, self._b, self._n)
+        return self._reduced
+
+    @property
+    def vertices(self):
+        """
+        Vertices spanning the constrained region,
+         array of shape (n, 2).
+        """
+        raise NotImplementedError("Vertices are not available for this constraint")
+
 
 #
 #
@@ -207,6 +404,10 @@ class Constraint1D(Constraint):
 
         return C, b, 1
 
+    @property
+    def vertices(self):
+        return np.array([[self._x0, self._y0], [self._x1, self._y1]], dtype=float)
+
 
 #
 #
@@ -227,21 +428,35 @@ class Constraint2D(Constraint):
         pass
 
     def _linearized_constraint(self):
+        C, b = _half_planes(self._boundary_points())
+        return C, b, 0
 
-        points = self._boundary_points()
-        n = len(points)
+    @property
+    def vertices(self):
+        return np.array(self._boundary_points(), dtype=float)
 
-        C = np.zeros((n, 2))
-        b = np.zeros(n)
 
-        for i in range(0, n):
-            x0, y0 = points[i - 1]
-            x1, y1 = points[i]
-            C[i, 0] = y1 - y0
-            C[i, 1] = x0 - x1
-            b[i] = x0 * y1 - x1 * y0
+class PolygonConstraint(Constraint2D):
+    """
+    Constraint describing a convex polygon given by
+     its vertices in counter-clockwise order
+    """
 
-        return -C, -b, 0  # Negation to adhere to quadprog format C.T x >= b
+    def __init__(self, points):
+        points = np.asarray(points, dtype=float)
+        edges = np.roll(points, -1, axis=0) - points
+        following = np.roll(edges, -1, axis=0)
+        turns = edges[:, 0] * following[:, 1] - edges[:, 1] * following[:, 0]
+        if len(points) < 3 or np.any(turns <= 0):
+            raise ConvexError("""Points of this PolygonConstraint do not
+                               form a convex polygon in
+                               counter-clockwise order.""")
+
+        self._points = points
+        super().__init__()
+
+    def _boundary_points(self):
+        return self._points
 
 
 class CircleConstraint(Constraint2D):
@@ -254,18 +469,15 @@ class CircleConstraint(Constraint2D):
         self._edges = edges
         super().__init__()
 
-    def _boundary_points(self):
-
-        n = self._edges
-        radius = self._radius
-
-        step_angle = 2 * np.pi / n
+    def _polygon(self):
+        return _arc_polygon(self._radius, self._edges, 0.0, 2 * np.pi)
 
-        points = []
-        for i in range(0, n):
-            points.append(_point_on_circle(i * step_angle, radius))
+    def _boundary_points(self):
+        return self._polygon()[0]
 
-        return points
+    def _linearized_constraint(self):
+        _, C, b = self._polygon()
+        return C, b, 0
 
 
 class SectorConstraint(Constraint2D):
@@ -277,14 +489,10 @@ class SectorConstraint(Constraint2D):
 
         delta = (end - start) % (2 * np.pi)
         if delta > np.pi:
-            raise ConvexError(
-                """Delta angle of this SectorConstraint
+            raise ConvexError("""Delta angle of this SectorConstraint
                                is {:.1f} deg which is greater than 180
                                deg. Please reformulate to a convex
-                               constraint.""".format(
-                    np.rad2deg(delta)
-                )
-            )
+                               constraint.""".format(np.rad2deg(delta)))
 
         self._radius = radius
         self._start = start
@@ -293,23 +501,73 @@ class SectorConstraint(Constraint2D):
 
         super().__init__()
 
-    def _boundary_points(self):
-
-        radius = self._radius
-        start = self._start
-        delta = self._delta
-
-        n = math.ceil(delta / 2 * np.pi * self._edges)
+    def _polygon(self):
+        return _arc_polygon(self._radius, self._edges, self._start, self._delta)
 
-        step_angle = delta / n
+    def _boundary_points(self):
+        return self._polygon()[0]
 
-        points = []
+    def _linearized_constraint(self):
+        _, C, b = self._polygon()
+        return C, b, 0
 
-        # Origin
-        points.append((0, 0))
 
-        # Circle arc
-        for i in range(0, n + 1):
-            points.append(_point_on_circle(i * step_angle + start, radius))
+def forbidden_zone_sectors(radius, forbidden_zones, edges=16, tol=1e-9):
+    """
+    Decompose a circle of given radius, less the forbidden
+     angular zones given as (start, end) pairs in radians
+     (counterclockwise from start to end), into the least
+     number of convex disjuncts. No convex part of the allowed
+     region spans more than pi, so each allowed arc of width w
+     is split into ceil(w / pi) equal SectorConstraints.
+     Overlapping zones are merged, without any zone a single
+     CircleConstraint is returned.
+
+    The arcs are discretized with the density of a
+     CircleConstraint with the given number of edges.
+    """
+    two_pi = 2 * np.pi
+    zones = sorted(
+        (start % two_pi, start % two_pi + (end - start) % two_pi)
+        for start, end in forbidden_zones
+        if (end - start) % two_pi > tol
+    )
+    if not zones:
+        return [CircleConstraint(radius, edges)]
 
-        return points
+    merged = [list(zones[0])]
+    for start, end in zones[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    # The last zone may wrap past 2 pi onto the first ones
+    while len(merged) > 1 and merged[-1][1] - two_pi >= merged[0][0]:
+        _, end = merged.pop(0)
+        merged[-1][1] = max(merged[-1][1], end + two_pi)
+
+    # SectorConstraint uses ceil(delta / 2 * pi * edges) segments
+    sector_edges = edges / np.pi**2
+    sectors = []
+    for i, (_, end) in enumerate(merged):
+        following = merged[(i + 1) % len(merged)][0]
+        if i == len(merged) - 1:
+            following += two_pi
+        width = following - end
+        if width <= tol:
+            continue
+
+        # Arcs up to pi (1 + tol) wide take a single sector of pi
+        n = math.ceil(width / np.pi - tol)
+        bounds = end + np.arange(n + 1) * min(width / n, np.pi)
+        for lower, upper in zip(bounds[:-1], bounds[1:]):
+            # Sectors of pi may exceed it by rounding of upper - lower
+            while (upper - lower) % two_pi > np.pi:
+                upper = np.nextafter(upper, lower)
+            sectors.append(SectorConstraint(radius, lower, upper, sector_edges))
+
+    if not sectors:
+        raise ConstraintError("The forbidden zones cover the full circle")
+
+    return sectors
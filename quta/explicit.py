@@ -0,0 +1,255 @@
+"""
+Module containing an explicit (multiparametric) allocation law
+
+For a fixed combination of disjuncts and a fixed active set,
+the solution of the allocation QP is an affine function of
+the global thrust, valid within a polyhedral critical region
+of global thrusts. ExplicitBackend stores these regions per
+combination and evaluates the affine law instead of solving
+a QP whenever the global thrust is inside a known region.
+
+Regions are discovered from the active sets of QPs solved by
+a fallback backend, offline by compile_law on a set of sample
+setpoints and, unless frozen, online for setpoints outside
+all known regions. Setpoints outside all regions are always
+solved by the fallback, so the law is exact also where it is
+incomplete. The law lives in the compiled problem data of the
+allocator and is dropped on any change of configuration,
+pickle the allocator to store a compiled law.
+"""
+
+import numpy as np
+
+from quta.solvers import OPTIMAL, QuadprogBackend, SolverBackend, SolverResult
+
+
+# pylint: disable=invalid-name,too-few-public-methods,too-many-instance-attributes
+# pylint: disable=too-many-arguments,too-many-locals
+class CriticalRegion:
+    """
+    Critical region {theta : H theta <= h} of a single active
+     set, with the solution x = F theta + f and the multipliers
+     lagrangian = L theta + l for the coupling right hand side
+     theta. The objective of the QP (G, a) is kept as a quadratic
+     function of theta.
+    """
+
+    __slots__ = ("H", "h", "F", "f", "L", "l", "Q", "q", "c", "active")
+
+    def __init__(self, H, h, *, F, f, L, l, active, G, a):
+        self.H = H
+        self.h = h
+        self.F = F
+        self.f = f
+        self.L = L
+        self.l = l
+        self.active = active
+
+        self.Q = F.T @ G @ F
+        self.q = F.T @ (G @ f - a)
+        self.c = 0.5 * f @ G @ f - a @ f
+
+    def contains(self, theta, tol=1e-9):
+        """
+        Whether theta is within the region
+        """
+        return np.all(self.H @ theta <= self.h + tol * (1 + np.abs(self.h)))
+
+    def evaluate(self, theta):
+        """
+        Solution and objective at theta
+        """
+        return (
+            self.F @ theta + self.f,
+            0.5 * theta @ self.Q @ theta + self.q @ theta + self.c,
+        )
+
+
+def critical_region(G, a, constraints, n_coupling, active):
+    """
+    Critical region of the QP with objective (G, a) and
+     constraints (C, b, n_eq) as a function of the first
+     n_coupling entries of b, for the given (1-based) active
+     set. Returns None if the active constraints are linearly
+     dependent.
+    """
+    C, b, n_eq = constraints
+    n = len(a)
+    A = np.union1d(np.arange(n_eq), np.asarray(active) - 1).astype(int)
+    inactive = np.setdiff1d(np.arange(len(b)), A)
+    C_A = C[:, A]
+    k = len(A)
+
+    # Selection of the coupling entries of b
+    S = np.zeros((len(b), n_coupling))
+    S[np.arange(n_coupling), np.arange(n_coupling)] = 1
+    b_0 = b.copy()
+    b_0[:n_coupling] = 0
+
+    K = np.zeros((n + k, n + k))
+    K[:n, :n] = G
+    K[:n, n:] = -C_A
+    K[n:, :n] = C_A.T
+    if np.linalg.cond(K) > 1e12:
+        return None
+
+    rhs = np.zeros((n + k, 1 + n_coupling))
+    rhs[:n, 0] = a
+    rhs[n:, 0] = b_0[A]
+    rhs[n:, 1:] = S[A]
+    sol = np.linalg.solve(K, rhs)
+
+    f, F = sol[:n, 0], sol[:n, 1:]
+    l = np.zeros(len(b))
+    L = np.zeros((len(b), n_coupling))
+    l[A], L[A] = sol[n:, 0], sol[n:, 1:]
+
+    # Primal feasibility of the inactive constraints, dual
+    # feasibility of the active inequalities
+    C_I = C[:, inactive]
+    ineq = A[A >= n_eq]
+    H = np.concatenate((-(C_I.T @ F - S[inactive]), -L[ineq]), axis=0)
+    h = np.concatenate((C_I.T @ f - b_0[inactive], l[ineq]))
+
+    return CriticalRegion(H, h, F=F, f=f, L=L, l=l, active=A + 1, G=G, a=a)
+
+
+class _ExplicitProblem:
+    """
+    Critical regions of a single combination together with
+     the fallback problem. The region inequalities are stacked
+     to locate theta with a single matrix-vector product.
+    """
+
+    __slots__ = ("G", "a", "xu", "fallback", "regions", "_H", "_h", "_starts")
+
+    def __init__(self, G, a, xu, fallback):
+        self.G = G
+        self.a = a
+        self.xu = xu
+        self.fallback = fallback
+        self.regions = []
+        self._H = None
+        self._h = None
+        self._starts = None
+
+    def add(self, region):
+        """
+        Add a region to the law
+        """
+        self.regions.append(region)
+        self._H = None
+
+    def locate(self, theta, tol=1e-9):
+        """
+        A region containing theta, or None
+        """
+        if not self.regions:
+            return None
+
+        if self._H is None:
+            # Regions without inequalities get a trivial one
+            H = [r.H if len(r.h) else np.zeros((1, len(theta))) for r in self.regions]
+            h = [
+                r.h + tol * (1 + np.abs(r.h)) if len(r.h) else [1.0]
+                for r in self.regions
+            ]
+            self._starts = np.cumsum([0] + [len(r) for r in h[:-1]])
+            self._H = np.concatenate(H)
+            self._h = np.concatenate(h)
+
+        violation = np.maximum.reduceat(self._H @ theta - self._h, self._starts)
+        inside = np.flatnonzero(violation <= 0)
+        return self.regions[inside[0]] if len(inside) else None
+
+
+class ExplicitBackend(SolverBackend):
+    """
+    Backend evaluating an explicit piecewise affine law, falling
+     back to another backend (by default quadprog) outside the
+     known critical regions. With learn=True, the regions of the
+     fallback solutions are added to the law, at most max_regions
+     per combination. Set learn=False to freeze the law.
+
+    The law is only valid for the right hand side of the
+     thruster constraints it was learnt with, it is dropped
+     when thrust scales change.
+    """
+
+    name = "explicit"
+    rhs_in_prepare = True
+
+    def __init__(self, fallback=None, learn=True, max_regions=256):
+        self.fallback = QuadprogBackend() if fallback is None else fallback
+        self.learn = learn
+        self.max_regions = max_regions
+
+        #: Number of solves by the explicit law
+        self.hits = 0
+        #: Number of solves by the fallback backend
+        self.misses = 0
+        #: Number of critical regions learnt
+        self.regions = 0
+
+    def formulate(self, G, a):
+        return (G, a, np.linalg.solve(G, a), self.fallback.formulate(G, a))
+
+    def prepare(self, formulation, C, n_coupling, blocks):
+        G, a, xu, fallback = formulation
+        problem = self.fallback.prepare(fallback, C, n_coupling, blocks)
+        return (n_coupling, _ExplicitProblem(G, a, xu, problem))
+
+    def solve(self, problem, C, b, n_eq):
+        n_coupling, explicit = problem
+        theta = b[:n_coupling]
+
+        region = explicit.locate(theta)
+        if region is not None:
+            self.hits += 1
+            x, f = region.evaluate(theta)
+            return SolverResult(
+                x,
+                f,
+                explicit.xu,
+                np.zeros(2, dtype=int),
+                region.L @ theta + region.l,
+                region.active,
+                OPTIMAL,
+            )
+
+        self.misses += 1
+        res = self.fallback.solve(explicit.fallback, C, b, n_eq)
+
+        if (
+            self.learn
+            and res.status == OPTIMAL
+            and len(explicit.regions) < self.max_regions
+        ):
+            region = critical_region(
+                explicit.G, explicit.a, (C, b, n_eq), n_coupling, res.active
+            )
+            if region is not None and region.contains(theta, 1e-6):
+                explicit.add(region)
+                self.regions += 1
+
+        return res
+
+
+def compile_law(allocator, global_thrusts, relax=True):
+    """
+    Compile the explicit law of an allocator using an
+     ExplicitBackend, by allocating the sample global thrusts
+     of shape (N, 3). Returns the total number of regions.
+    """
+    backend = allocator.backend
+    if not isinstance(backend, ExplicitBackend):
+        raise TypeError("The allocator must use an ExplicitBackend")
+
+    learn = backend.learn
+    backend.learn = True
+    try:
+        allocator.allocate_many(global_thrusts, relax)
+    finally:
+        backend.learn = learn
+
+    return backend.regions
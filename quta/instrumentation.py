@@ -0,0 +1,156 @@
+"""
+Module containing instrumentation of the allocation solver
+
+An Allocator with a stats callback set (see
+Allocator.set_stats_callback) hands an AllocationStats
+object to the callback after every call to allocate.
+StatsRecorder is such a callback, aggregating the stats
+into fixed-bin histograms suitable for long runs.
+
+AllocationDiagnostics lists the combinations of disjuncts
+without solution and whether the search was exhaustive, as
+returned by Allocator.allocate on request.
+"""
+
+from collections import Counter
+
+import numpy as np
+
+
+# pylint: disable=too-few-public-methods,too-many-instance-attributes
+class AllocationStats:
+    """
+    Statistics of a single allocation
+    """
+
+    __slots__ = (
+        "evaluated",
+        "infeasible",
+        "screened",
+        "iterations",
+        "assembly_time",
+        "solve_time",
+        "total_time",
+        "combination",
+        "active",
+    )
+
+    def __init__(self):
+        #: Number of QPs solved, including relaxations
+        self.evaluated = 0
+        #: Number of QPs without solution
+        self.infeasible = 0
+        #: Number of combinations skipped as certainly infeasible
+        self.screened = 0
+        #: Total number of quadprog iterations
+        self.iterations = 0
+        #: Time spent assembling constraints [s]
+        self.assembly_time = 0.0
+        #: Time spent solving QPs [s]
+        self.solve_time = 0.0
+        #: Total time of the allocation [s]
+        self.total_time = 0.0
+        #: Winning combination of disjuncts
+        self.combination = None
+        #: Indices (1-based) of active constraints at the optimum
+        self.active = None
+
+    def record(self, res, solve_time):
+        """
+        Record the result of a single QP
+        """
+        self.evaluated += 1
+        self.solve_time += solve_time
+        if res is None:
+            self.infeasible += 1
+        else:
+            self.iterations += int(res[3][0])
+
+    def __repr__(self):
+        return "AllocationStats({})".format(
+            ", ".join(
+                "{}={!r}".format(name, getattr(self, name)) for name in self.__slots__
+            )
+        )
+
+
+_TIME_BINS = np.logspace(-6, 0, 25)
+_COUNT_BINS = np.array([1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384])
+
+DEFAULT_BINS = {
+    "evaluated": _COUNT_BINS,
+    "infeasible": _COUNT_BINS,
+    "screened": _COUNT_BINS,
+    "iterations": _COUNT_BINS,
+    "assembly_time": _TIME_BINS,
+    "solve_time": _TIME_BINS,
+    "total_time": _TIME_BINS,
+}
+
+
+class StatsRecorder:
+    """
+    Stats callback aggregating AllocationStats into
+     histograms with fixed bin edges, and counting
+     the winning combinations.
+
+    Bins are given per field as increasing edges, the
+     first and last counts hold values below the first
+     and above the last edge respectively.
+    """
+
+    def __init__(self, bins=None):
+        self._edges = dict(DEFAULT_BINS, **(bins or {}))
+        self._counts = {
+            field: np.zeros(len(edges) + 1, dtype=int)
+            for field, edges in self._edges.items()
+        }
+        self._maxima = dict.fromkeys(self._edges, 0)
+        self.calls = 0
+        self.winners = Counter()
+
+    def __call__(self, stats):
+        self.calls += 1
+        for field, edges in self._edges.items():
+            value = getattr(stats, field)
+            self._counts[field][np.searchsorted(edges, value, side="right")] += 1
+            self._maxima[field] = max(self._maxima[field], value)
+        self.winners[stats.combination] += 1
+
+    def histogram(self, field):
+        """
+        Histogram of field as (counts, edges)
+        """
+        return self._counts[field].copy(), self._edges[field]
+
+    def maximum(self, field):
+        """
+        Largest recorded value of field
+        """
+        return self._maxima[field]
+
+
+class AllocationDiagnostics:
+    """
+    Diagnostics of a single allocation
+    """
+
+    __slots__ = ("infeasible", "exhaustive")
+
+    def __init__(self, infeasible=None, exhaustive=True):
+        #: Combinations of disjuncts without solution
+        self.infeasible = [] if infeasible is None else infeasible
+        #: Whether the search completed within its budget
+        self.exhaustive = exhaustive
+
+    @property
+    def n_infeasible(self):
+        """
+        Number of combinations without solution
+        """
+        return len(self.infeasible)
+
+    def __repr__(self):
+        return "AllocationDiagnostics(infeasible={!r}, exhaustive={!r})".format(
+            self.infeasible, self.exhaustive
+        )
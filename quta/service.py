@@ -0,0 +1,117 @@
+"""
+Module containing an asyncio front end to the allocator
+
+AsyncAllocator runs Allocator.allocate on a worker pool,
+keeping the event loop free during the combinatorial
+search. Requests are coalesced, at most one solve is
+running and at most one request is waiting for it. A
+request arriving while another one is waiting supersedes
+it, the waiting request fails with SupersededError instead
+of being queued behind the newer setpoint.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SupersededError(Exception):
+    """
+    Raised for a request dropped in favour of a newer one
+    """
+
+
+class AsyncAllocator:
+    """
+    Awaitable wrapper of an Allocator, solving on the given
+     concurrent.futures executor, by default a single worker
+     thread owned by this object. The allocator is not thread
+     safe and is only ever used by one solve at a time.
+
+    Cancelling an awaiting request drops it if it has not
+     started yet, a running solve is completed in the worker
+     and its result discarded. Pass a time_budget to allocate
+     to bound the duration of each solve.
+    """
+
+    def __init__(self, allocator, executor=None):
+        self._allocator = allocator
+        self._owns_executor = executor is None
+        self._executor = (
+            ThreadPoolExecutor(max_workers=1) if executor is None else executor
+        )
+        self._pending = None
+        self._task = None
+
+        #: Number of requests superseded by a newer one
+        self.superseded = 0
+
+    @property
+    def allocator(self):
+        """
+        The wrapped allocator.
+        """
+        return self._allocator
+
+    @property
+    def busy(self):
+        """
+        Whether a solve is running.
+        """
+        return self._task is not None
+
+    async def allocate(self, global_thrust, relax=True, **kwargs):
+        """
+        Allocate global thrust vector to available thrusters,
+         see Allocator.allocate for the arguments and result.
+         Raises SupersededError if a newer request arrives
+         before this one has started.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        if self._pending is not None:
+            stale = self._pending[-1]
+            if not stale.done():
+                stale.set_exception(SupersededError("Superseded by a newer request"))
+                self.superseded += 1
+
+        call = functools.partial(
+            self._allocator.allocate, global_thrust, relax, **kwargs
+        )
+        self._pending = (call, future)
+
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending is not None:
+                call, future = self._pending
+                self._pending = None
+
+                # Cancelled while waiting
+                if future.done():
+                    continue
+
+                try:
+                    result = await loop.run_in_executor(self._executor, call)
+                except Exception as e:  # pylint: disable=broad-except
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._task = None
+
+    def close(self):
+        """
+        Shut down the executor if owned by this object, waiting
+         for a running solve to finish.
+        """
+        if self._owns_executor:
+            self._executor.shutdown()
@@ -0,0 +1,582 @@
+"""
+Module containing the QP solver backends of the allocator
+
+An Allocator solves one strictly convex QP per combination
+of disjunct constraints, on the quadprog form
+
+    min  1/2 x^T G x - a^T x
+    s.t. C.T x >= b, the first n_eq rows as equalities
+
+through a SolverBackend, returning a SolverResult. Three
+backends are included, QuadprogBackend, NullSpaceBackend and
+DiagonalBackend.
+
+NullSpaceQP eliminates the equality constraints, the global
+forces and moment and the equalities of one dimensional
+thrusters, through a basis of their null space computed once
+per combination. Only the remaining inequalities are left to
+quadprog, in fewer variables.
+
+The allocation problem has a diagonal Hessian, a few
+coupling equality constraints (the global forces and
+moment) and otherwise only constraints acting on the two
+thrust components of a single thruster. DiagonalQP
+exploits this by maximizing the dual function over the
+coupling multipliers, with the primal problem separating
+into a projection per thruster. Each iteration is
+vectorized over all thrusters, so the cost grows
+linearly with the number of thrusters.
+"""
+
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+import numpy as np
+import quadprog
+
+from quta.constraints import constraint_vertices
+
+OPTIMAL = "optimal"
+INFEASIBLE = "infeasible"
+
+SolverResult = namedtuple(
+    "SolverResult",
+    ("x", "objective", "unconstrained", "iterations", "lagrangian", "active", "status"),
+)
+SolverResult.__doc__ = """
+Result of a QP solve. The first six fields follow the
+ layout of the tuple returned by quadprog.solve_qp, i.e.
+ the solution, the objective value, the unconstrained
+ solution, the iteration counts, the Lagrange multipliers
+ and the (1-based) indices of the active constraints.
+ status is OPTIMAL or INFEASIBLE, all other fields are
+ None for infeasible problems.
+"""
+
+
+def infeasible_result():
+    """
+    SolverResult of a problem without solution
+    """
+    return SolverResult(None, None, None, None, None, None, INFEASIBLE)
+
+
+# pylint: disable=invalid-name
+def inverse_cholesky(G):
+    """
+    Inverse of the upper triangular Cholesky factor R of G,
+     where G = R^T R, as accepted by quadprog in factorized mode.
+    """
+    return np.linalg.inv(np.linalg.cholesky(G).T)
+
+
+# pylint: disable=invalid-name
+class SolverBackend(ABC):
+    """
+    Interface of the QP solvers used by Allocator.
+
+    Work that only depends on the objective is done once per
+     problem formulation in formulate, work that also depends
+     on the constraint matrix of a combination is done once per
+     combination in prepare. Only the right hand side b varies
+     between calls to solve. Backends are passed to worker
+     processes by set_executor and must be picklable.
+    """
+
+    #: Name of the backend
+    name = None
+
+    #: Whether prepare depends on the right hand side of the
+    #:  thruster constraints in blocks, such problems are
+    #:  prepared again when the right hand side changes
+    rhs_in_prepare = False
+
+    def formulate(self, G, a):
+        """
+        Prepare the objective (G, a), returns the formulation
+         passed on to prepare.
+        """
+        return (G, a)
+
+    def prepare(self, formulation, C, n_coupling, blocks):
+        """
+        Prepare the problem of a single combination, returns the
+         problem passed on to solve. The first n_coupling columns
+         of C are equalities coupling all variables, blocks lists
+         the remaining constraints as (variables, constraints)
+         per thruster, with constraints as returned by
+         Constraint.constraints or None for unconstrained
+         variables.
+        """
+        # pylint: disable=unused-argument
+        return formulation
+
+    @abstractmethod
+    def solve(self, problem, C, b, n_eq):
+        """
+        Solve the prepared problem for the constraints (C, b, n_eq),
+         returns a SolverResult.
+        """
+
+
+class QuadprogBackend(SolverBackend):
+    """
+    Backend using quadprog.solve_qp, by default in factorized
+     mode with the inverse Cholesky factor of G computed once
+     per formulation.
+    """
+
+    name = "quadprog"
+
+    def __init__(self, factorized=True):
+        self.factorized = factorized
+
+    def formulate(self, G, a):
+        if self.factorized:
+            return (inverse_cholesky(G), a, True)
+        return (G, a, False)
+
+    def solve(self, problem, C, b, n_eq):
+        G, a, factorized = problem
+        try:
+            res = quadprog.solve_qp(  # pylint: disable=c-extension-no-member
+                G, a, C, b, n_eq, factorized
+            )
+        except ValueError:
+            return infeasible_result()
+        return SolverResult(*res, OPTIMAL)
+
+
+class NullSpaceBackend(SolverBackend):
+    """
+    Backend solving the inequality constrained QP in the null
+     space of the equality constraints with quadprog, see
+     NullSpaceQP. Combinations with linearly dependent
+     equalities are solved by quadprog in full.
+    """
+
+    name = "nullspace"
+
+    def formulate(self, G, a):
+        return (G, a, inverse_cholesky(G))
+
+    def prepare(self, formulation, C, n_coupling, blocks):
+        G, a, R_inv = formulation
+        n_eq = n_coupling + sum(c[2] for _, c in blocks if c is not None)
+        return (NullSpaceQP(G, a, C, n_eq), R_inv, a)
+
+    def solve(self, problem, C, b, n_eq):
+        qp, R_inv, a = problem
+        try:
+            if qp.Z is None:
+                res = quadprog.solve_qp(  # pylint: disable=c-extension-no-member
+                    R_inv, a, C, b, n_eq, True
+                )
+            else:
+                res = qp.solve(b)
+        except ValueError:
+            return infeasible_result()
+        return SolverResult(*res, OPTIMAL)
+
+
+class DiagonalBackend(SolverBackend):
+    """
+    Backend using DiagonalQP, requires a diagonal Hessian and
+     constraints that, apart from the coupling equalities, act
+     on pairs of variables.
+    """
+
+    name = "diagonal"
+    rhs_in_prepare = True
+
+    def __init__(self, tol=1e-9, max_iter=100):
+        self.tol = tol
+        self.max_iter = max_iter
+
+    def formulate(self, G, a):
+        g = np.diag(G)
+        if not np.array_equal(G, np.diag(g)):
+            raise ValueError("The diagonal backend requires a diagonal Hessian")
+        return (G, a)
+
+    def prepare(self, formulation, C, n_coupling, blocks):
+        G, a = formulation
+        qp = DiagonalQP(
+            np.diag(G),
+            a,
+            C[:, :n_coupling].T,
+            blocks,
+            tol=self.tol,
+            max_iter=self.max_iter,
+        )
+        return (n_coupling, qp)
+
+    def solve(self, problem, C, b, n_eq):
+        n_coupling, qp = problem
+        try:
+            x, f, iterations, _ = qp.solve(b[:n_coupling])
+        except ValueError:
+            return infeasible_result()
+
+        # Recover the active set and multipliers from the full constraints
+        residual = C.T @ x - b
+        tol = qp.tol * (1 + np.abs(b) + np.max(np.abs(x)))
+        active = np.union1d(np.arange(n_eq), np.flatnonzero(np.abs(residual) <= tol))
+        lagrangian = np.zeros(len(b))
+        lagrangian[active] = np.linalg.lstsq(C[:, active], qp.g * x - qp.a, rcond=None)[
+            0
+        ]
+
+        return SolverResult(
+            x,
+            f,
+            qp.a / qp.g,
+            np.array([iterations, 0]),
+            lagrangian,
+            active + 1,
+            OPTIMAL,
+        )
+
+
+BACKENDS = {
+    QuadprogBackend.name: QuadprogBackend,
+    NullSpaceBackend.name: NullSpaceBackend,
+    DiagonalBackend.name: DiagonalBackend,
+}
+
+
+# pylint: disable=invalid-name,too-many-instance-attributes,too-few-public-methods
+# pylint: disable=too-many-arguments
+class NullSpaceQP:
+    """
+    QP with objective (G, a) and constraints (C, b, n_eq), with
+     a fixed constraint matrix, solved in the null space of the
+     equalities. With A = C[:, :n_eq] = Q_1 R, any solution of
+     the equalities is x = P b_E + Z y, where P = Q_1 R^-T and
+     the columns of Z span the null space of A^T. The reduced
+     QP in y only has the inequality constraints. Z is None if
+     the equalities are linearly dependent.
+    """
+
+    __slots__ = (
+        "n_eq",
+        "xu",
+        "Z",
+        "R_inv",
+        "C_red",
+        "_P",
+        "_a_red",
+        "_K",
+        "_LG",
+        "_La",
+        "_LC",
+        "_PGP",
+        "_Pa",
+        "_equalities",
+    )
+
+    def __init__(self, G, a, C, n_eq, tol=1e-10):
+        self.n_eq = n_eq
+        self.xu = np.linalg.solve(G, a)
+        self.Z = None
+
+        Q, R = np.linalg.qr(C[:, :n_eq], mode="complete")
+        R = R[:n_eq]
+        diag = np.abs(np.diag(R))
+        if n_eq >= len(a) or np.any(diag <= tol * max(1, np.max(diag, initial=0))):
+            return
+
+        Z = Q[:, n_eq:]
+        C_in = C[:, n_eq:]
+        self.Z = Z
+        self.R_inv = inverse_cholesky(Z.T @ G @ Z)
+        self.C_red = np.ascontiguousarray(Z.T @ C_in)
+
+        # Everything linear in b_E is precomputed
+        L = np.linalg.solve(R, Q[:, :n_eq].T)
+        P = L.T
+        self._P = P
+        self._a_red = Z.T @ a
+        self._K = np.concatenate((Z.T @ G @ P, C_in.T @ P))
+        self._LG = L @ G
+        self._La = L @ a
+        self._LC = L @ C_in
+        self._PGP = 0.5 * P.T @ G @ P
+        self._Pa = P.T @ a
+        self._equalities = np.arange(1, n_eq + 1, dtype=np.int32)
+
+    def solve(self, b):
+        """
+        Solve for the right hand side b, returns the tuple of
+         quadprog.solve_qp for the full problem. Raises ValueError
+         if the problem is infeasible.
+        """
+        n_eq = self.n_eq
+        n_red = len(self._a_red)
+        b_eq = b[:n_eq]
+        shift = self._K @ b_eq
+        a = self._a_red - shift[:n_red]
+        b_in = b[n_eq:] - shift[n_red:]
+
+        if len(b_in):
+            # pylint: disable=c-extension-no-member
+            y, f, _, iterations, lagrangian_in, active = quadprog.solve_qp(
+                self.R_inv, a, self.C_red, b_in, 0, True
+            )
+        else:
+            y = self.R_inv @ (self.R_inv.T @ a)
+            f = -0.5 * a @ y
+            iterations = np.zeros(2, dtype=np.int32)
+            lagrangian_in = np.zeros(0)
+            active = np.zeros(0, dtype=np.int32)
+
+        x = self._P @ b_eq + self.Z @ y
+
+        # Multipliers of the equalities from G x - a = C lagrangian
+        lagrangian = np.empty(len(b))
+        lagrangian[n_eq:] = lagrangian_in
+        lagrangian[:n_eq] = self._LG @ x - self._La - self._LC @ lagrangian_in
+
+        return (
+            x,
+            f + b_eq @ (self._PGP @ b_eq - self._Pa),
+            self.xu,
+            iterations,
+            lagrangian,
+            np.concatenate((self._equalities, active + n_eq)),
+        )
+
+
+class DiagonalQP:
+    """
+    Strictly convex QP on the form
+
+        min  1/2 x^T diag(g) x - a^T x
+        s.t. E x = e
+             x[block] in polygon, for each block
+
+    where each block is a pair of variables constrained to a
+     bounded convex polygon (possibly degenerate to a segment
+     or a point) given as linear constraints (C, b, n_eq) on
+     quadprog format. Variables not part of any block, or of
+     a block without constraints, are free.
+
+    The coupling right hand side e is given per solve.
+    """
+
+    def __init__(self, g, a, E, blocks, *, tol=1e-9, max_iter=100):
+        g = np.asarray(g, dtype=float)
+        a = np.asarray(a, dtype=float)
+        E = np.asarray(E, dtype=float)
+
+        if np.any(g <= 0):
+            raise ValueError("Hessian must be positive definite")
+
+        self.g = g
+        self.a = a
+        self.E = E
+        self.tol = tol
+        self.max_iter = max_iter
+
+        # Polygons are projected onto in the scaled variables z = sqrt(g) x
+        polygons = []
+        columns = []
+        for idx, constraints in blocks:
+            if constraints is None:
+                continue
+            sqrt_g = np.sqrt(g[list(idx)])
+            vertices = constraint_vertices(*constraints) * sqrt_g
+            polygons.append(vertices)
+            columns.append(list(idx))
+
+        self.feasible = all(len(v) > 0 for v in polygons)
+
+        self._columns = np.array(columns, dtype=int).reshape((-1, 2))
+        self._free = np.setdiff1d(np.arange(len(g)), self._columns.ravel())
+        self._sqrt_g = np.sqrt(g[self._columns])
+        self._prepare_polygons(polygons)
+        self._E_blocks = E[:, self._columns].transpose(1, 0, 2)
+
+        # Lipschitz constant of the dual gradient
+        self._lipschitz = np.linalg.norm((E / g) @ E.T, 2)
+
+    def _prepare_polygons(self, polygons):
+        """
+        Pad all polygons to the same number of vertices to allow
+         for vectorized projections.
+        """
+        n_blocks = len(polygons)
+        k = max((len(v) for v in polygons), default=1)
+
+        V = np.zeros((n_blocks, k, 2))
+        D = np.zeros((n_blocks, k, 2))
+        solid = np.zeros(n_blocks, dtype=bool)
+
+        for i, vertices in enumerate(polygons):
+            if len(vertices) == 0:
+                continue
+            n = len(vertices)
+            V[i, :n] = vertices
+            V[i, n:] = vertices[-1]
+            # Edges, a segment is a single edge
+            D[i, : n - 1] = vertices[1:] - vertices[:-1]
+            if n > 2:
+                D[i, n - 1] = vertices[0] - vertices[-1]
+                solid[i] = True
+
+        # Inward normals of the edges, padded edges have zero normal
+        N = np.stack((-D[:, :, 1], D[:, :, 0]), axis=2)
+
+        self._V = V
+        self._D = D
+        self._DD = np.einsum("ijk,ijk->ij", D, D)
+        self._N = N
+        self._Nb = np.einsum("ijk,ijk->ij", N, V)
+        self._solid = solid
+
+    def _project(self, q):
+        """
+        Euclidean projection of the points q (one per block)
+         onto the polygons, together with the Jacobians of
+         the projections.
+        """
+        n_blocks = len(q)
+        J = np.zeros((n_blocks, 2, 2))
+
+        # Closest point on each edge
+        t = np.einsum("ijk,ijk->ij", q[:, None, :] - self._V, self._D)
+        t = np.clip(
+            np.divide(t, self._DD, out=np.zeros_like(t), where=self._DD > 0), 0, 1
+        )
+        candidates = self._V + t[:, :, None] * self._D
+        distances = np.sum((candidates - q[:, None, :]) ** 2, axis=2)
+        closest = np.argmin(distances, axis=1)
+
+        rows = np.arange(n_blocks)
+        z = candidates[rows, closest]
+
+        # On an edge, the Jacobian projects onto the edge direction
+        t_c = t[rows, closest]
+        on_edge = (t_c > 0) & (t_c < 1)
+        d = self._D[rows, closest][on_edge]
+        J[on_edge] = (
+            np.einsum("ij,ik->ijk", d, d) / self._DD[rows, closest][on_edge, None, None]
+        )
+
+        # Points within the polygon are their own projection
+        inside = self._solid & np.all(
+            np.einsum("ijk,ik->ij", self._N, q) >= self._Nb, axis=1
+        )
+        z[inside] = q[inside]
+        J[inside] = np.eye(2)
+
+        return z, J
+
+    def _primal(self, mu):
+        """
+        Minimizer x of the Lagrangian for the multipliers mu,
+         and the Jacobian of x with respect to E^T mu, block
+         diagonal and given by its blocks and free diagonal.
+        """
+        g = self.g
+        w = self.a + self.E.T @ mu
+
+        x = w / g
+
+        cols = self._columns
+        sqrt_g = self._sqrt_g
+        z, J = self._project(w[cols] / sqrt_g)
+        x[cols] = z / sqrt_g
+        J = J / (sqrt_g[:, :, None] * sqrt_g[:, None, :])
+
+        return x, J
+
+    def _newton_matrix(self, J):
+        E = self.E
+        free = self._free
+        M = (E[:, free] / self.g[free]) @ E[:, free].T
+
+        if len(J):
+            E_J = np.einsum("bij,bjk->bik", self._E_blocks, J)
+            M += np.einsum("bik,blk->il", E_J, self._E_blocks)
+
+        return M + 1e-9 * self._lipschitz * np.eye(len(M))
+
+    def _separates(self, d, e):
+        """
+        Whether the hyperplane with normal d separates e from the
+         image E x of the feasible set, proving infeasibility.
+         The support function of the image is separable over
+         the blocks and attained at the polygon vertices.
+        """
+        w = self.E.T @ d
+        if np.any(w[self._free] != 0):
+            return False
+
+        support = np.sum(
+            np.max(np.einsum("ijk,ik->ij", self._V, w[self._columns] / self._sqrt_g), 1)
+        )
+        margin = self.tol * np.linalg.norm(w) * (1 + np.max(np.abs(self._V), initial=0))
+        return d @ e > support + margin
+
+    def _line_search(self, mu, d, e, slope_0):
+        """
+        Line search maximizing the dual along d. The directional
+         derivative is piecewise linear and decreasing, its root
+         is approximated by a safeguarded Newton iteration until
+         the derivative has decreased sufficiently.
+        """
+        lo, hi = 0.0, np.inf
+        t = 1.0
+        for _ in range(self.max_iter):
+            x, J = self._primal(mu + t * d)
+            slope = d @ (e - self.E @ x)
+
+            if abs(slope) <= 0.1 * slope_0:
+                break
+
+            if slope > 0:
+                lo = t
+            else:
+                hi = t
+
+            curvature = d @ self._newton_matrix(J) @ d
+            t_next = t + slope / curvature
+            if not lo < t_next < hi:
+                t_next = 2 * t if np.isinf(hi) else 0.5 * (lo + hi)
+
+            if abs(t_next - t) <= 1e-12 * t:
+                break
+            t = t_next
+
+        return mu + t * d, x, J
+
+    def solve(self, e, mu=None):
+        """
+        Solve the QP for the coupling right hand side e.
+         Returns (x, f, iterations, mu) where f is the
+         objective value and mu the coupling multipliers,
+         raises ValueError if the problem is infeasible.
+        """
+        if not self.feasible:
+            raise ValueError("constraints are inconsistent, no solution")
+
+        e = np.asarray(e, dtype=float)
+        mu = np.zeros(len(e)) if mu is None else np.array(mu, dtype=float)
+
+        x, J = self._primal(mu)
+
+        for iteration in range(self.max_iter):
+            r = e - self.E @ x
+            scale = 1 + np.max(np.abs(e)) + np.max(np.abs(x))
+            if np.max(np.abs(r)) <= self.tol * scale:
+                f = 0.5 * x @ (self.g * x) - self.a @ x
+                return x, f, iteration, mu
+
+            # Semismooth Newton direction on the dual
+            d = np.linalg.solve(self._newton_matrix(J), r)
+            if self._separates(d, e):
+                break
+            mu, x, J = self._line_search(mu, d, e, d @ r)
+
+        raise ValueError("constraints are inconsistent, no solution")
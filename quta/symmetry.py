@@ -0,0 +1,134 @@
+"""
+Module containing detection of thruster layout symmetries
+
+A layout is symmetric under a mirroring, or a rotation by
+180 degrees, of the plane if every thruster is mapped onto
+a thruster with the same, mirrored, set of disjunct
+constraints. The allocation problem for a combination of
+disjuncts and a global thrust then has the same objective
+as the problem for the mirrored combination and the
+mirrored global thrust. For global thrusts invariant under
+the symmetry, only one combination of each such pair needs
+to be solved.
+"""
+
+import numpy as np
+
+#: Candidate symmetries as (name, transformation of the plane)
+TRANSFORMATIONS = (
+    ("mirror_x", np.diag([1.0, -1.0])),
+    ("mirror_y", np.diag([-1.0, 1.0])),
+    ("rotation", np.diag([-1.0, -1.0])),
+)
+
+
+# pylint: disable=invalid-name,too-many-locals
+def _same_points(p, q, tol):
+    if p.shape != q.shape:
+        return False
+    distance = np.max(np.abs(p[:, None, :] - q[None, :, :]), axis=2)
+    return np.all(distance.min(axis=0) <= tol) and np.all(distance.min(axis=1) <= tol)
+
+
+class Symmetry:
+    """
+    Symmetry of a thruster layout under the transformation M
+     of the plane. Thruster i is mapped onto thruster
+     permutation[i], its disjunct k onto disjunct
+     disjuncts[i][k] of that thruster.
+    """
+
+    __slots__ = ("name", "M", "T", "permutation", "disjuncts", "_flipped")
+
+    def __init__(self, name, M, permutation, disjuncts):
+        self.name = name
+        self.M = M
+        #: Transformation of the global thrust [Fx, Fy, Mz]
+        self.T = np.diag([M[0, 0], M[1, 1], M[0, 0] * M[1, 1]])
+        self.permutation = permutation
+        self.disjuncts = disjuncts
+        self._flipped = tuple(int(i) for i in np.flatnonzero(np.diag(self.T) < 0))
+
+    def transform_combination(self, combination):
+        """
+        The mirrored combination of disjuncts, None entries
+         (relaxed thrusters) are kept as None.
+        """
+        out = [None] * len(combination)
+        for i, disjunct in enumerate(combination):
+            if disjunct is not None:
+                disjunct = self.disjuncts[i][disjunct]
+            out[self.permutation[i]] = disjunct
+        return tuple(out)
+
+    def variable_map(self, n_variables):
+        """
+        Matrix P mapping the problem variables, the thrust of
+         every thruster followed by the (optional) slack
+         variables, onto their mirrored counterparts.
+        """
+        P = np.zeros((n_variables, n_variables))
+        for i, j in enumerate(self.permutation):
+            P[2 * j : 2 * j + 2, 2 * i : 2 * i + 2] = self.M
+        n = 2 * len(self.permutation)
+        if n_variables > n:
+            P[n:, n:] = self.T
+        return P
+
+    def invariant(self, global_thrust, tol=1e-9):
+        """
+        Whether the global thrust is invariant under the symmetry
+        """
+        magnitudes = [abs(float(g)) for g in global_thrust]
+        scale = tol * (1 + max(magnitudes))
+        return all(magnitudes[i] <= scale for i in self._flipped)
+
+    def __repr__(self):
+        return "Symmetry({!r}, permutation={!r})".format(self.name, self.permutation)
+
+
+def find_symmetries(thrusters, tol=1e-6):
+    """
+    Find the symmetries of the thrusters among the candidate
+     TRANSFORMATIONS. Thrusters with constraints not providing
+     vertices prevent any symmetry from being found.
+    """
+    try:
+        vertices = [[c.vertices for c in t.static_constraints()] for t in thrusters]
+    except NotImplementedError:
+        return []
+
+    positions = np.array([[t.pos_x, t.pos_y] for t in thrusters], dtype=float)
+    symmetries = []
+
+    for name, M in TRANSFORMATIONS:
+        permutation = []
+        disjuncts = []
+        for i, position in enumerate(positions):
+            match = np.flatnonzero(
+                np.all(np.abs(positions - M @ position) <= tol, axis=1)
+            )
+            if len(match) != 1:
+                break
+            j = int(match[0])
+
+            mapping = []
+            for v in vertices[i]:
+                found = [
+                    k
+                    for k, w in enumerate(vertices[j])
+                    if k not in mapping and _same_points(v @ M.T, w, tol)
+                ]
+                if not found:
+                    break
+                mapping.append(found[0])
+
+            if len(mapping) != len(vertices[i]):
+                break
+
+            permutation.append(j)
+            disjuncts.append(tuple(mapping))
+        else:
+            symmetries.append(Symmetry(name, M, tuple(permutation), disjuncts))
+
+    return symmetries
@@ -1,8 +1,16 @@
 """
 Thruster module containing classes for different type of thrusters
 """
+
 import numpy as np
-from quta.constraints import Constraint, Constraint1D, CircleConstraint
+from quta.constraints import (
+    Constraint,
+    Constraint1D,
+    CircleConstraint,
+    PolygonConstraint,
+    convex_hull,
+    forbidden_zone_sectors,
+)
 
 
 class Thruster:
@@ -10,10 +18,15 @@ class Thruster:
     Class holding properties of a Thruster
     """
 
+    __slots__ = ("_x", "_u", "_rate", "_constraints", "_relaxed", "_relaxed_valid")
+
     def __init__(self, pos):
         self._x = np.array(pos)
         self._u = np.array([0, 0])
+        self._rate = None
         self._constraints = []
+        self._relaxed = None
+        self._relaxed_valid = False
 
     @property
     def pos_x(self):
@@ -35,9 +48,44 @@ class Thruster:
         """
         if isinstance(constraint, Constraint):
             self._constraints.append(constraint)
+            self._relaxed_valid = False
         else:
             raise TypeError("Constraint is not of proper type!")
 
+    @property
+    def thrust(self):
+        """
+        Current (previously allocated) thrust [Fx, Fy]
+        """
+        return self._u
+
+    @thrust.setter
+    def thrust(self, u):
+        self._u = np.array(u, dtype=float)
+
+    @property
+    def rate_limit(self):
+        """
+        Largest change of thrust [dFx, dFy] per allocation,
+         or None if the thrust is not rate limited
+        """
+        return self._rate
+
+    def set_rate_limit(self, max_change=None):
+        """
+        Limit the change of thrust per allocation to a box of
+         max_change (scalar or [dFx, dFy]) around the current
+         thrust. Call without arguments to remove the limit.
+        """
+        if max_change is None:
+            self._rate = None
+            return
+
+        rate = np.broadcast_to(np.asarray(max_change, dtype=float), (2,))
+        if np.any(rate < 0):
+            raise ValueError("Rate limit must be non-negative")
+        self._rate = tuple(float(r) for r in rate)
+
     @property
     def disjunctions(self):
         """
@@ -51,8 +99,46 @@ class Thruster:
         """
         return self._constraints
 
-    # def dynamic_constraints(self, current_state):
-    #    raise NotImplementedError('Dynamic constraints are not yet implemented')
+    def relaxed_constraint(self):
+        """
+        Returns a convex relaxation of the disjunct
+         constraints, the convex hull of their union,
+         or None if the hull is degenerate.
+        """
+        if not self._relaxed_valid:
+            self._relaxed = self._convex_hull_constraint()
+            self._relaxed_valid = True
+
+        return self._relaxed
+
+    def _convex_hull_constraint(self):
+        try:
+            points = np.concatenate([c.vertices for c in self._constraints])
+        except (NotImplementedError, ValueError):
+            return None
+
+        hull = convex_hull(points)
+        if len(hull) < 3:
+            return None
+
+        return PolygonConstraint(hull)
+
+    # pylint: disable=invalid-name
+    def dynamic_constraints(self, current_state=None):
+        """
+        Returns the rate limit as constraints (C, b, n_eq) on
+         the thrust, a box around current_state (by default the
+         current thrust), or None if the thrust is not rate
+         limited
+        """
+        if self._rate is None:
+            return None
+
+        u = self._u if current_state is None else np.asarray(current_state)
+        rate = np.array(self._rate)
+        C = np.array([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0], [0.0, -1.0]])
+        b = np.concatenate((u - rate, -u - rate))
+        return C, b, 0
 
     # def plot(self):
     #    raise NotImplementedError('Thruster visualization is not yet implemented')
@@ -68,6 +154,8 @@ class TransverseThruster(Thruster):
      direction, length and offset along line.
     """
 
+    __slots__ = ("_max_force",)
+
     def __init__(self, pos, max_force):
         super().__init__(pos)
 
@@ -86,6 +174,8 @@ class LongitudinalThruster(Thruster):
      direction, length and offset along line.
     """
 
+    __slots__ = ("_max_force",)
+
     def __init__(self, pos, max_force):
         super().__init__(pos)
 
@@ -103,12 +193,27 @@ class AzimuthThruster(Thruster):
      produce the same amount of force in any direction
      [0,2*pi]. The only bound existing is then the maximum
      force that can be delivered (max_force).
+
+    Directions in which the thruster may not deliver
+     force, e.g. to avoid thrust towards a neighbouring
+     thruster, are given as forbidden_zones, (start, end)
+     angles in radians. The remaining directions are
+     split into the least number of convex disjuncts.
     """
 
-    def __init__(self, pos, max_force, n_discret):
+    __slots__ = ("_max_force", "_n_discret", "_forbidden_zones")
+
+    def __init__(self, pos, max_force, n_discret, forbidden_zones=None):
         super().__init__(pos)
 
         self._max_force = max_force
         self._n_discret = int(n_discret // 2) * 2
+        self._forbidden_zones = tuple(forbidden_zones or ())
 
-        self.add_constraint(CircleConstraint(self._max_force, self._n_discret))
+        if self._forbidden_zones:
+            for c in forbidden_zone_sectors(
+                self._max_force, self._forbidden_zones, self._n_discret
+            ):
+                self.add_constraint(c)
+        else:
+            self.add_constraint(CircleConstraint(self._max_force, self._n_discret))
@@ -1,8 +1,12 @@
 """
 Tests for allocator module
 """
+
+import numpy as np
 import pytest
 import quta.allocator as al
+import quta.thruster as th
+from quta.constraints import concatenate_constraints, pad_constraints
 
 
 def test_baseclass():
@@ -16,3 +20,32 @@ def test_implementations(IMP):
 
     with pytest.raises(al.AllocationError):
         a.allocate(0, 0)
+
+
+@pytest.mark.parametrize("relax", [True, False])
+def test_assemble_constraints(relax, mixed_allocator):
+    a = mixed_allocator()
+    a.add_thruster(th.LongitudinalThruster((3, -4), 200))
+
+    for combination in [(0, 0, 0, 0, 0), (0, 0, 0, 1, 0), (0, 0, 0, None, 0)]:
+        C, b, n_eq = a.assemble_constraints([1, 2, 3], relax, combination)
+
+        # Reference, equalities kept on top in the order of the thrusters
+        n = a.n_relaxed_problem if relax else a.n_problem
+        m = a.n_problem
+        C_ref = np.zeros((3, n))
+        C_ref[0, :m:2] = C_ref[1, 1:m:2] = 1
+        C_ref[2, :m:2] = [-t.pos_y for t in a.thrusters]
+        C_ref[2, 1:m:2] = [t.pos_x for t in a.thrusters]
+        if relax:
+            C_ref[:, m:] = np.eye(3)
+        reference = (C_ref, np.array([1.0, 2.0, 3.0]), 3)
+        for i, (_, constraints) in enumerate(a._blocks(combination)):
+            C_t, b_t, n_eq_t = constraints
+            reference = concatenate_constraints(
+                reference, (pad_constraints(C_t, 2 * i, n), b_t, n_eq_t)
+            )
+
+        assert n_eq == reference[2]
+        assert np.array_equal(C, reference[0].T)
+        assert np.array_equal(b, reference[1])
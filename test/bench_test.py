@@ -0,0 +1,33 @@
+"""
+Tests for benchmark module
+"""
+
+import json
+import quta.bench as bench
+
+
+def test_build_allocator():
+    a = bench.build_allocator(4, 16, 3)
+    assert a.n_thrusters == 4
+    assert all(t.disjunctions == 3 for t in a.thrusters)
+
+
+def test_main(tmp_path, monkeypatch):
+    monkeypatch.setattr(bench, "SWEEPS", {"disjuncts": [1, 2]})
+    output = tmp_path / "bench.json"
+
+    results = bench.main(["--repeats", "3", "--output", str(output)])
+
+    assert [r["combinations"] for r in results] == [1, 8]
+    data = json.loads(output.read_text())
+    for r in data["results"]:
+        assert set(r["latency"]) == {"p50", "p99", "max"}
+        assert r["latency"]["p50"] <= r["latency"]["max"]
+
+
+def test_compare_solvers(monkeypatch):
+    monkeypatch.setattr(bench, "SWEEPS", {"n_thrusters": [2]})
+
+    results = bench.run(repeats=3, solvers=("quadprog", "diagonal"))
+
+    assert [r["solver"] for r in results] == ["quadprog", "diagonal"]
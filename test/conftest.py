@@ -0,0 +1,67 @@
+"""
+Thruster layouts shared by the tests
+"""
+
+import numpy as np
+import pytest
+
+from quta.thruster import AzimuthThruster, TransverseThruster, Thruster
+from quta.allocator import MinimizePowerAllocator
+from quta.constraints import SectorConstraint
+
+
+def _split_thruster(pos):
+    t = Thruster(pos)
+    t.add_constraint(SectorConstraint(800, 0, np.pi, 4))
+    t.add_constraint(SectorConstraint(800, np.pi, 2 * np.pi, 4))
+    return t
+
+
+def _split_allocator(positions, **kwargs):
+    a = MinimizePowerAllocator(**kwargs)
+    for pos in positions:
+        a.add_thruster(_split_thruster(pos))
+    return a
+
+
+def _mixed_allocator(transverse=(15,), scales=None, **kwargs):
+    a = MinimizePowerAllocator(**kwargs)
+    scales = [1.0] * (len(transverse) + 3) if scales is None else scales
+    a.add_thruster(AzimuthThruster((-20, 5), 1000 * scales[0], 16))
+    a.add_thruster(AzimuthThruster((-20, -5), 1000 * scales[1], 16))
+    for i, x in enumerate(transverse):
+        a.add_thruster(TransverseThruster((x, 0), 500 * scales[2 + i]))
+    t = Thruster((10, 3))
+    t.add_constraint(SectorConstraint(800 * scales[-1], 0, 2.5, 3))
+    t.add_constraint(SectorConstraint(800 * scales[-1], 3, 5.5, 3))
+    a.add_thruster(t)
+    return a
+
+
+@pytest.fixture(name="split_thruster")
+def fixture_split_thruster():
+    """
+    Factory of thrusters at a given position, able to thrust
+     within either half of a circle
+    """
+    return _split_thruster
+
+
+@pytest.fixture(name="split_allocator")
+def fixture_split_allocator():
+    """
+    Factory of allocators with a split_thruster at each of the
+     given positions, further arguments go to the allocator
+    """
+    return _split_allocator
+
+
+@pytest.fixture(name="mixed_allocator")
+def fixture_mixed_allocator():
+    """
+    Factory of allocators with two azimuths at the stern,
+     transverse thrusters at the given x positions and a thruster
+     with two sectors, in that order. scales multiply the capacity
+     of each thruster, further arguments go to the allocator.
+    """
+    return _mixed_allocator
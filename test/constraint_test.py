@@ -1,6 +1,7 @@
 """
 Tests for constraint module
 """
+
 import numpy as np
 import pytest
 import quta.constraints as cons
@@ -120,3 +121,124 @@ def test_sector_constraint():
     assert np.allclose(C, C_comp)
     assert np.allclose(b, b_comp)
     assert n == 0
+
+
+def test_forbidden_zone_sectors():
+    d = np.deg2rad
+
+    # A single zone across 0 deg leaves an arc of 300 deg
+    sectors = cons.forbidden_zone_sectors(1, [(d(-30), d(30))])
+    assert len(sectors) == 2
+    assert all(isinstance(c, cons.SectorConstraint) for c in sectors)
+
+    # Two opposite zones leave two arcs below 180 deg
+    assert len(cons.forbidden_zone_sectors(1, [(d(80), d(100)), (d(260), d(280))])) == 2
+
+    # Overlapping zones are merged, also across 0 deg
+    zones = [(d(350), d(20)), (d(5), d(30)), (d(100), d(120)), (d(110), d(170))]
+    sectors = cons.forbidden_zone_sectors(1, zones, 64)
+    assert len(sectors) == 2
+
+    # Points in allowed directions are covered, forbidden ones are not
+    for angle in np.arange(0, 360, 2.5):
+        point = 0.9 * np.array([np.cos(d(angle)), np.sin(d(angle))])
+        covered = any(
+            np.all(c.constraints[0] @ point >= c.constraints[1] - 1e-9) for c in sectors
+        )
+        forbidden = angle <= 30 or angle >= 350 or 100 <= angle <= 170
+        if not forbidden:
+            assert covered, angle
+        elif angle not in (30, 350, 100, 170):
+            assert not covered, angle
+
+    assert isinstance(cons.forbidden_zone_sectors(1, [])[0], cons.CircleConstraint)
+
+    with pytest.raises(cons.ConstraintError):
+        cons.forbidden_zone_sectors(1, [(0, d(181)), (d(180), d(2))])
+
+    # Allowed arcs of pi, up to the tolerance, take a single sector
+    assert len(cons.forbidden_zone_sectors(1000, [(0, np.pi - 5e-10)], 32)) == 1
+    for start in np.linspace(0, 2 * np.pi, 50):  # Rounding must not raise
+        sectors = cons.forbidden_zone_sectors(1000, [(start, start + np.pi)], 32)
+        assert len(sectors) == 1
+
+
+def test_convex_hull():
+    points = [(0, 0), (1, 0), (1, 1), (0, 1), (0.5, 0.5), (1, 0)]
+    hull = cons.convex_hull(points)
+    assert np.allclose(hull, [[0, 0], [1, 0], [1, 1], [0, 1]])
+
+    assert len(cons.convex_hull([(0, 0), (1, 1)])) == 2
+
+
+def test_polygon_constraint():
+    c = cons.PolygonConstraint([(-1, -1), (1, -1), (1, 1), (-1, 1)])
+    C, b, n = c.constraints
+    assert np.all(C @ [0, 0] >= b)
+    assert not np.all(C @ [2, 0] >= b)
+    assert n == 0
+    assert np.allclose(c.vertices, [(-1, -1), (1, -1), (1, 1), (-1, 1)])
+
+    with pytest.raises(cons.ConvexError):
+        cons.PolygonConstraint([(-1, -1), (-1, 1), (1, 1), (1, -1)])
+
+
+def test_shared_polygons():
+    c0 = cons.CircleConstraint(1000, 32)
+    c1 = cons.CircleConstraint(1000, 32)
+    s0 = cons.SectorConstraint(1000, 0.5, 2.0, 4)
+    s1 = cons.SectorConstraint(1000, 0.5, 2.0, 4)
+
+    assert c0.constraints[0] is c1.constraints[0]
+    assert s0.constraints[1] is s1.constraints[1]
+    assert c0.constraints[0] is not cons.CircleConstraint(1000, 16).constraints[0]
+
+    with pytest.raises(ValueError):
+        c0.constraints[1][0] = 0
+
+    # Every boundary point lies on two of the half-planes
+    for c in (c0, s0):
+        C, b, _ = c.constraints
+        slack = C @ c.vertices.T - b[:, None]
+        assert np.all(slack >= -1e-9)
+        assert np.all(np.sum(np.isclose(slack, 0, atol=1e-6), axis=0) == 2)
+
+
+def test_constraint_vertices():
+    square = cons.PolygonConstraint([(-1, -1), (1, -1), (1, 1), (-1, 1)])
+    assert np.allclose(cons.constraint_vertices(*square.constraints), square.vertices)
+
+    segment = cons.Constraint1D((-1, -2), (1, 2))
+    assert np.allclose(
+        cons.constraint_vertices(*segment.constraints), [(-1, -2), (1, 2)]
+    )
+
+    C = np.array([[1.0, 0.0], [-1.0, 0.0]]).T
+    assert len(cons.constraint_vertices(C, np.array([1.0, 0.0]))) == 0
+
+
+def test_presolve_constraints():
+    # Two of the four end caps of a tilted line segment are redundant
+    segment = cons.Constraint1D((-1, -2), (1, 2))
+    C, b, n_eq = segment.reduced_constraints
+    assert (len(b), n_eq) == (3, 1)
+    assert np.allclose(cons.constraint_vertices(C, b, n_eq), segment.vertices)
+
+    # The two edges meeting at the origin of a half circle coincide
+    sector = cons.SectorConstraint(1000, 0, np.pi, 4)
+    C, b, n_eq = sector.reduced_constraints
+    assert len(b) == len(sector.constraints[1]) - 1
+    assert np.allclose(
+        cons.constraint_vertices(C, b), cons.constraint_vertices(*sector.constraints)
+    )
+
+    # Unbounded sets are returned as is, judged by the vertices alone
+    # x >= 0 and y >= 2x - 3 are redundant but cut off (-5, 100)
+    C = np.array([[1, 0], [0, 1], [-1, 1], [-2, 1]], dtype=float)
+    b = np.array([0, 0, -1, -3], dtype=float)
+    assert len(cons.constraint_vertices(C, b)) == 3
+    assert cons.presolve_constraints(C, b)[0] is C
+
+    # Sets without redundancy are returned as is
+    circle = cons.CircleConstraint(1000, 16)
+    assert circle.reduced_constraints[0] is circle.constraints[0]
@@ -0,0 +1,50 @@
+"""
+Tests for explicit module
+"""
+
+import pickle
+import pytest
+import numpy as np
+
+import quta.bench as bench
+from quta.explicit import ExplicitBackend, compile_law, critical_region
+
+
+def test_critical_region():
+    a = bench.build_allocator(2, 16, 1)
+    G, a_ = a.problem_formulation(False)
+    C, b, n_eq = a.assemble_constraints([500, 100, 0], False, (0, 0))
+    res = a.allocate([500, 100, 0], relax=False)[1]
+
+    region = critical_region(G, a_, (C, b, n_eq), 3, res.active)
+    assert region.contains(np.array([500.0, 100.0, 0.0]))
+    x, f = region.evaluate(np.array([500.0, 100.0, 0.0]))
+    assert np.allclose(x, res.x)
+    assert np.isclose(f, res.objective)
+
+
+@pytest.mark.parametrize("relax", [True, False])
+def test_explicit_law(relax):
+    reference = bench.build_allocator(3, 16, 2)
+    explicit = bench.build_allocator(3, 16, 2, solver=ExplicitBackend(learn=False))
+
+    n_regions = compile_law(explicit, bench.setpoints(explicit, 200, seed=1), relax)
+    assert n_regions > 0
+    assert not explicit.backend.learn
+
+    # Storing the compiled law
+    explicit = pickle.loads(pickle.dumps(explicit))
+
+    u_ref, objective_ref, _ = reference.allocate_many(
+        bench.setpoints(reference, 50, seed=2), relax
+    )
+    u, objective, _ = explicit.allocate_many(
+        bench.setpoints(explicit, 50, seed=2), relax
+    )
+
+    assert explicit.backend.hits > 0
+    assert np.allclose(objective, objective_ref, equal_nan=True)
+    assert np.allclose(u, u_ref, atol=1e-6, equal_nan=True)
+
+    with pytest.raises(TypeError):
+        compile_law(reference, [[0, 0, 0]])
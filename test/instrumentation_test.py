@@ -0,0 +1,100 @@
+"""
+Tests for instrumentation module
+"""
+
+import warnings
+import numpy as np
+import pytest
+
+from quta.thruster import Thruster, AzimuthThruster
+from quta.allocator import MinimizePowerAllocator, AllocationError
+from quta.constraints import SectorConstraint
+from quta.instrumentation import AllocationStats, AllocationDiagnostics, StatsRecorder
+
+
+def test_allocation_stats():
+    a = MinimizePowerAllocator()
+    for pos in [(-20, 5), (-20, -5)]:
+        t = Thruster(pos)
+        t.add_constraint(SectorConstraint(1000, 0, np.pi / 2))
+        t.add_constraint(SectorConstraint(1000, np.pi, 3 * np.pi / 2))
+        a.add_thruster(t)
+
+    stats = []
+    a.set_stats_callback(stats.append)
+
+    _, res = a.allocate([500, 0, 0], relax=False)
+
+    s = stats[-1]
+    assert isinstance(s, AllocationStats)
+    # Both thrusters thrusting astern is screened out
+    assert s.evaluated == 3
+    assert s.infeasible == 2
+    assert s.screened == 1
+    assert s.iterations > 0
+    assert s.combination == (0, 0)
+    assert np.all(s.active == res[5])
+    assert 0 < s.solve_time <= s.total_time
+    assert 0 < s.assembly_time <= s.total_time
+
+    # Callback is invoked also when there is no solution
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        with pytest.raises(AllocationError):
+            a.allocate([0, 5000, 0], relax=False)
+    assert len(stats) == 2
+    assert stats[-1].infeasible == stats[-1].evaluated == 0
+    assert stats[-1].screened == 4
+    assert stats[-1].combination is None
+
+    a.set_stats_callback()
+    a.allocate([500, 500, 0])
+    assert len(stats) == 2
+
+
+def test_stats_recorder():
+    a = MinimizePowerAllocator()
+    a.add_thruster(AzimuthThruster((-20, 5), 10000, 32))
+    a.add_thruster(AzimuthThruster((-20, -5), 10000, 32))
+
+    recorder = StatsRecorder(bins={"evaluated": np.array([1, 2])})
+    a.set_stats_callback(recorder)
+
+    for wanted in ([0, 500, 8000], [25000, 0, 0], [1000, 0, 0]):
+        a.allocate(wanted)
+
+    assert recorder.calls == 3
+    counts, edges = recorder.histogram("evaluated")
+    assert np.all(edges == [1, 2])
+    assert np.all(counts == [0, 3, 0])
+    assert recorder.histogram("total_time")[0].sum() == 3
+    assert recorder.maximum("iterations") > 0
+    assert recorder.winners[(0, 0)] == 3
+
+
+def test_allocation_diagnostics():
+    def build(**kwargs):
+        a = MinimizePowerAllocator(**kwargs)
+        for pos in [(-20, 5), (-20, -5)]:
+            t = Thruster(pos)
+            t.add_constraint(SectorConstraint(1000, 0, np.pi / 2))
+            t.add_constraint(SectorConstraint(1000, np.pi, 3 * np.pi / 2))
+            a.add_thruster(t)
+        return a
+
+    a = build()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        u, res, diagnostics = a.allocate([500, 0, 0], relax=False, diagnostics=True)
+    assert isinstance(diagnostics, AllocationDiagnostics)
+    assert diagnostics.n_infeasible == 3
+    assert sorted(diagnostics.infeasible) == [(0, 1), (1, 0), (1, 1)]
+
+    with pytest.raises(AllocationError) as err:
+        a.allocate([0, 5000, 0], relax=False)
+    assert err.value.diagnostics.n_infeasible == 4
+
+    # Warnings are opt-in
+    a = build(warn_infeasible=True)
+    with pytest.warns(UserWarning):
+        a.allocate([500, 0, 0], relax=False)
@@ -3,6 +3,8 @@ Integration tests for quta package
 """
 
 import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 import numpy as np
 
@@ -24,6 +26,22 @@ def calculate_global_thrust(thruster_positions, xy_forces):
     return out
 
 
+def build_sector_allocator(positions, offset=0.0, width=2.0, **kwargs):
+    """
+    Allocator with a thruster at each position, each able to
+     thrust within three sectors of the given width, 120 deg
+     apart and the first starting at offset.
+    """
+    a = MinimizePowerAllocator(**kwargs)
+    for pos in positions:
+        t = Thruster(pos)
+        for k in range(3):
+            start = 2 * np.pi * k / 3 + offset
+            t.add_constraint(SectorConstraint(1000, start, start + width, 2))
+        a.add_thruster(t)
+    return a
+
+
 def test_double_stern_azimuths():
     az1 = AzimuthThruster((-20, 5), 10000, 32)
     az2 = AzimuthThruster((-20, -5), 10000, 32)
@@ -70,3 +88,485 @@ def test_single_stern_azimuth_with_bow_thruster():
     u, res = a.allocate([0, 2002, 0], relax=True)
     assert np.allclose(u, [0, 1000, 0, 1000])
     assert np.allclose(res[0][-3:], [0, 2, 0], atol=1e-1)
+
+
+def test_compiled_constraints():
+    az1 = AzimuthThruster((-20, 5), 10000, 32)
+    az2 = AzimuthThruster((-20, -5), 10000, 32)
+    tt = TransverseThruster((20, 0), 1000)
+
+    compiled = MinimizePowerAllocator()
+    assembled = MinimizePowerAllocator(compiled=False)
+
+    for a in (compiled, assembled):
+        a.add_thruster(az1)
+        a.add_thruster(az2)
+        a.add_thruster(tt)
+
+    for wanted in ([0, 500, 8000], [1000, -200, 0], [25000, 0, 0]):
+        u_c, res_c = compiled.allocate(wanted)
+        u_a, res_a = assembled.allocate(wanted)
+        assert np.allclose(u_c, u_a)
+        assert np.isclose(res_c[1], res_a[1])
+
+    # Adding a disjunct directly to a thruster invalidates the compiled matrices
+    az1.add_constraint(SectorConstraint(10000, 0, np.pi / 2))
+    u_c, _ = compiled.allocate([0, 500, 8000])
+    u_a, _ = assembled.allocate([0, 500, 8000])
+    assert np.allclose(u_c, u_a)
+    assert len(compiled._compiled_constraints) == 2
+
+
+def test_branch_and_bound():
+    def build(search):
+        a = build_sector_allocator(
+            [(-20, 5), (-20, -5), (0, 6), (20, 3), (20, -3)], 0.3, 1.7, search=search
+        )
+        a.add_thruster(TransverseThruster((25, 0), 500))
+        return a
+
+    exhaustive = build("exhaustive")
+    bnb = build("branch_and_bound")
+
+    rng = np.random.default_rng(1234)
+    for relax in (True, False):
+        for wanted in rng.normal(size=(5, 3)) * [800, 800, 8000]:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                try:
+                    _, res_e = exhaustive.allocate(wanted, relax)
+                except AllocationError:
+                    with pytest.raises(AllocationError):
+                        bnb.allocate(wanted, relax)
+                    continue
+                _, res_b = bnb.allocate(wanted, relax)
+            assert np.isclose(res_e[1], res_b[1])
+
+    with pytest.raises(ValueError):
+        MinimizePowerAllocator(search="unknown")
+
+
+@pytest.mark.parametrize("search", ["exhaustive", "branch_and_bound"])
+def test_warm_start(search):
+    positions = [(-20, 5), (-20, -5), (20, 0)]
+    cold = build_sector_allocator(positions, search=search, warm_start=False)
+    warm = build_sector_allocator(positions, search=search, warm_start=True)
+
+    for wanted in np.linspace([100, 200, 1000], [300, -100, 2000], 10):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            u_c, res_c = cold.allocate(wanted)
+            u_w, res_w = warm.allocate(wanted)
+        assert np.isclose(res_c[1], res_w[1])
+        assert np.allclose(u_c, u_w, atol=1e-6)
+
+    # The previous active set is verified without QP iterations, and the
+    # relaxation proves it optimal without solving other combinations
+    stats = []
+    warm.set_stats_callback(stats.append)
+    warm.allocate([100, 200, 1000])
+    _, res = warm.allocate([100, 200, 1000])
+    assert np.all(res[3] == 0)
+    assert stats[-1].evaluated <= 2
+
+
+@pytest.mark.parametrize("search", ["exhaustive", "branch_and_bound"])
+def test_allocate_many(search):
+    a = MinimizePowerAllocator(search=search)
+    a.add_thruster(AzimuthThruster((-20, 5), 10000, 32))
+    a.add_thruster(AzimuthThruster((-20, -5), 10000, 32))
+    a.add_thruster(TransverseThruster((20, 0), 1000))
+
+    wanted = [[0, 500, 8000], [25000, 0, 0], [1000, -200, 0]]
+
+    u, objective, slack = a.allocate_many(wanted)
+    assert u.shape == (3, a.n_problem)
+    for i, w in enumerate(wanted):
+        u_i, res = a.allocate(w)
+        assert np.allclose(u[i], u_i)
+        assert np.isclose(objective[i], res[1])
+        assert np.allclose(slack[i], res[0][-3:])
+
+    # Infeasible rows are nan without relaxation
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        u, objective, slack = a.allocate_many(wanted, relax=False)
+    assert np.all(np.isnan(u[1])) and np.isnan(objective[1])
+    assert np.allclose(slack[[0, 2]], 0)
+
+    with pytest.raises(ValueError):
+        a.allocate_many([[0, 0]])
+
+
+def test_parallel_exhaustive_search():
+    positions = [(-20, 5), (-20, -5), (20, 0)]
+    serial = build_sector_allocator(positions)
+    _, res_s = serial.allocate([300, -100, 2000])
+
+    threaded = build_sector_allocator(positions)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        threaded.set_executor(executor, workers=3)
+        _, res_t = threaded.allocate([300, -100, 2000])
+    threaded.set_executor()
+
+    processes = build_sector_allocator(positions)
+    processes.set_executor(workers=2)
+    try:
+        _, res_p = processes.allocate([300, -100, 2000])
+    finally:
+        processes.set_executor()
+
+    for res in (res_t, res_p):
+        assert res[1] == res_s[1]
+        assert np.all(res[0] == res_s[0])
+
+
+def test_cached_formulation():
+    a = MinimizePowerAllocator()
+    a.add_thruster(AzimuthThruster((-20, 5), 10000, 32))
+    a.add_thruster(AzimuthThruster((-20, -5), 10000, 32))
+
+    _, res = a.allocate([25000, 0, 0])
+    assert np.allclose(res[0][-3:], [5000, 0, 0])
+
+    # Changing the slack coefficients invalidates the cached factorization
+    a.set_slack_coefficients((1, 1000, 1000))
+    _, res = a.allocate([25000, 0, 0])
+    G, _ = a.problem_formulation(True)
+    assert G[-3, -3] == 1
+    assert np.allclose(res[0][-3:], [25000 / 3, 0, 0])
+
+
+@pytest.mark.parametrize("relax", [True, False])
+def test_diagonal_solver(relax, mixed_allocator):
+    reference = mixed_allocator(solver="quadprog")
+    diagonal = mixed_allocator(solver="diagonal")
+
+    rng = np.random.default_rng(1)
+    for wanted in rng.normal(size=(20, 3)) * [1000, 1000, 10000]:
+        try:
+            u_ref, res_ref = reference.allocate(wanted, relax)
+        except AllocationError:
+            with pytest.raises(AllocationError):
+                diagonal.allocate(wanted, relax)
+            continue
+
+        u, res = diagonal.allocate(wanted, relax)
+        assert np.isclose(res[1], res_ref[1], rtol=1e-6)
+        assert np.allclose(u, u_ref, atol=1e-3 * np.max(np.abs(u_ref)))
+
+    with pytest.raises(ValueError):
+        MinimizePowerAllocator(solver="unknown")
+
+
+@pytest.mark.parametrize("relax", [True, False])
+def test_nullspace_solver(relax, mixed_allocator):
+    reference, nullspace = (
+        mixed_allocator((15, 18, 21), solver=solver, warm_start=True)
+        for solver in ("quadprog", "nullspace")
+    )
+
+    rng = np.random.default_rng(3)
+    for wanted in rng.normal(size=(20, 3)) * [1000, 1000, 10000]:
+        try:
+            u_ref, res_ref = reference.allocate(wanted, relax)
+        except AllocationError:
+            with pytest.raises(AllocationError):
+                nullspace.allocate(wanted, relax)
+            continue
+
+        u, res = nullspace.allocate(wanted, relax)
+        assert np.isclose(res[1], res_ref[1])
+        assert np.allclose(u, u_ref, atol=1e-6 * np.max(np.abs(u_ref)))
+
+    # More equalities than variables, solved in full
+    a = MinimizePowerAllocator(solver="nullspace")
+    a.add_thruster(TransverseThruster((15, 0), 500))
+    a.add_thruster(TransverseThruster((-15, 0), 500))
+    u, _ = a.allocate([0, 200, 0], relax=False)
+    assert np.allclose(u, [0, 100, 0, 100])
+
+
+@pytest.mark.parametrize("search", ["exhaustive", "branch_and_bound"])
+def test_time_budget(search):
+    a = build_sector_allocator(
+        [(-20, 5), (-20, -5), (20, 3), (20, -3)], 0.3, 1.7, search=search
+    )
+
+    rng = np.random.default_rng(4321)
+    for wanted in rng.normal(size=(5, 3)) * [800, 800, 8000]:
+        _, res, diagnostics = a.allocate(wanted, diagnostics=True)
+        assert diagnostics.exhaustive
+
+        u, res_b, diagnostics = a.allocate(wanted, diagnostics=True, max_solves=2)
+        assert res_b[1] >= res[1] - 1e-9
+        if diagnostics.exhaustive:
+            # Branch and bound may prove the optimum within the budget
+            assert search == "branch_and_bound"
+            assert np.isclose(res_b[1], res[1])
+        assert np.allclose(
+            calculate_global_thrust(
+                [(t.pos_x, t.pos_y) for t in a.thrusters], res_b[0][: a.n_problem]
+            )
+            + res_b[0][-3:],
+            wanted,
+        )
+
+    with pytest.raises(AllocationError) as err:
+        a.allocate(wanted, time_budget=0)
+    assert not err.value.diagnostics.exhaustive
+
+    # A single combination takes a single solve, no relaxation is solved
+    a = MinimizePowerAllocator(search=search)
+    a.add_thruster(AzimuthThruster((-20, 5), 1000, 16))
+    a.add_thruster(AzimuthThruster((-20, -5), 1000, 16))
+    a.add_thruster(TransverseThruster((15, 0), 500))
+    stats = []
+    a.set_stats_callback(stats.append)
+    _, res = a.allocate([500, 100, 1000])
+    for max_solves in (1, 2):
+        _, res_b, diagnostics = a.allocate(
+            [500, 100, 1000], diagnostics=True, max_solves=max_solves
+        )
+        assert diagnostics.exhaustive
+        assert stats[-1].evaluated == 1
+        assert np.isclose(res_b[1], res[1])
+
+
+def test_result_cache():
+    a = MinimizePowerAllocator()
+    a.add_thruster(AzimuthThruster((-20, 5), 1000, 16))
+    a.add_thruster(AzimuthThruster((-20, -5), 1000, 16))
+    assert a.cache_info() is None
+
+    a.set_result_cache(resolution=10, maxsize=2)
+
+    u, _ = a.allocate([100, 0, 0])
+    u_near, _ = a.allocate([102, 0, 0])
+    assert np.all(u_near == u)
+    assert a.cache_info() == (1, 1, 2, 1)
+
+    # Changing a returned allocation in place leaves the cache intact
+    u_near *= 2
+    u_hit, res = a.allocate([101, 0, 0])
+    assert np.all(u_hit == u)
+    assert not res[0].flags.writeable
+
+    # Relax and quantization cell are part of the key, oldest entry is evicted
+    a.allocate([100, 0, 0], relax=False)
+    a.allocate([200, 0, 0])
+    a.allocate([100, 0, 0])
+    assert a.cache_info() == (2, 4, 2, 2)
+
+    # Bounded searches bypass the cache
+    a.allocate([200, 0, 0], max_solves=10)
+    assert a.cache_info().hits == 2
+
+    # Configuration changes drop the cache
+    a.add_thruster(TransverseThruster((25, 0), 500))
+    u, _ = a.allocate([100, 0, 0])
+    assert len(u) == 6
+    a.set_slack_coefficients((1, 1, 1))
+    a.allocate([100, 0, 0])
+    assert a.cache_info() == (2, 6, 2, 1)
+
+    # Failed allocations are cached and raise again on a hit
+    hits = a.cache_info().hits
+    for _ in range(2):
+        with pytest.raises(AllocationError) as error:
+            a.allocate([10000, 0, 0], relax=False)
+        assert error.value.diagnostics.exhaustive
+    assert a.cache_info().hits == hits + 1
+
+    a.set_result_cache()
+    assert a.cache_info() is None
+
+
+def test_presolve(split_thruster):
+    def build(presolve):
+        a = MinimizePowerAllocator(presolve=presolve)
+        for i, pos in enumerate([(-20, 5), (-20, -5), (20, 3), (20, -3)]):
+            if i % 2:
+                t = Thruster(pos)
+                t.add_constraint(Constraint1D((-300, -200), (300, 200)))
+            else:
+                t = split_thruster(pos)
+            a.add_thruster(t)
+        return a
+
+    full, reduced = build(False), build(True)
+    assert (
+        reduced.compile_constraints(True, (0,) * 4)[0].shape[1]
+        < full.compile_constraints(True, (0,) * 4)[0].shape[1]
+    )
+
+    rng = np.random.default_rng(7)
+    for wanted in rng.normal(size=(10, 3)) * [600, 600, 8000]:
+        _, res_full = full.allocate(wanted)
+        _, res = reduced.allocate(wanted)
+        assert np.isclose(res[1], res_full[1])
+
+
+def test_symmetry(split_allocator):
+    positions = [(-20, 5), (-20, -5), (20, 5), (20, -5)]
+    full = split_allocator(positions, symmetry=False)
+    reduced = split_allocator(positions, symmetry=True)
+    evaluated = {}
+    full.set_stats_callback(lambda s: evaluated.__setitem__("full", s.evaluated))
+    reduced.set_stats_callback(lambda s: evaluated.__setitem__("reduced", s.evaluated))
+    assert [s.name for s in reduced.layout_symmetries()] == [
+        "mirror_x",
+        "mirror_y",
+        "rotation",
+    ]
+
+    # Invariant under mirroring in the x-axis
+    for relax in (True, False):
+        _, res_full = full.allocate([1500, 0, 0], relax=relax)
+        _, res = reduced.allocate([1500, 0, 0], relax=relax)
+        assert np.isclose(res[1], res_full[1])
+        assert evaluated["reduced"] < evaluated["full"]
+
+    # Invariant under mirroring in the y-axis, infeasible mirrors are reported
+    *_, report_full = full.allocate([0, 2500, 0], relax=False, diagnostics=True)
+    *_, report = reduced.allocate([0, 2500, 0], relax=False, diagnostics=True)
+    assert report_full.n_infeasible == 15
+    assert sorted(report.infeasible) == sorted(report_full.infeasible)
+
+    # Not invariant, nothing is skipped
+    _, res_full = full.allocate([1500, 300, 100])
+    _, res = reduced.allocate([1500, 300, 100])
+    assert np.isclose(res[1], res_full[1])
+    assert evaluated["reduced"] == evaluated["full"]
+
+    # Only symmetries mapping thrusters onto equally scaled ones are kept
+    for i in (0, 1):
+        reduced.set_thrust_scale(i, 0.5)
+    assert [s.name for s in reduced.layout_symmetries()] == ["mirror_x"]
+    for i in (0, 1):
+        reduced.set_thrust_scale(i, 1.0)
+    assert len(reduced.layout_symmetries()) == 3
+
+
+def test_feasibility_screen(split_allocator):
+    a = split_allocator([(-20, 5), (-20, -5), (20, 3), (20, -3)])
+    stats = []
+    a.set_stats_callback(stats.append)
+
+    # At least three thrusters are needed in the port half plane
+    _, res, report = a.allocate([0, 2000, 0], relax=False, diagnostics=True)
+    assert stats[-1].screened == 11
+    assert stats[-1].evaluated == 5
+    assert report.n_infeasible == 15
+
+    # Screened combinations are also skipped by allocate_many
+    wanted = np.array([[0, 2000, 0], [0, -2000, 0], [300, 100, 2000]])
+    u, objective, _ = a.allocate_many(wanted, relax=False)
+    assert np.isclose(objective[0], res[1])
+    for i, global_thrust in enumerate(wanted):
+        u_i, res_i = a.allocate(global_thrust, relax=False)
+        assert np.isclose(objective[i], res_i[1])
+        assert np.allclose(u[i], u_i)
+
+    # Slack variables make every combination feasible
+    a.allocate([0, 2000, 0])
+    assert stats[-1].screened == 0
+
+
+@pytest.mark.parametrize("solver", ["quadprog", "nullspace", "diagonal"])
+def test_disabled_thruster(solver, split_allocator):
+    positions = [(-20, 5), (-20, -5), (20, 3), (20, -3)]
+    a = split_allocator(positions, solver=solver)
+    stats = []
+    a.set_stats_callback(stats.append)
+    wanted = [600, 300, 2000]
+    _, res_all = a.allocate(wanted, relax=False)
+    evaluated = stats[-1].evaluated
+
+    a.set_thruster_enabled(1, False)
+    assert a.enabled_thrusters == (True, False, True, True)
+    reference = split_allocator(positions[:1] + positions[2:], solver=solver)
+    for relax in (True, False):
+        u, res = a.allocate(wanted, relax=relax)
+        u_ref, res_ref = reference.allocate(wanted, relax=relax)
+        assert np.isclose(res[1], res_ref[1], rtol=1e-6)
+        assert np.allclose(u[2:4], 0)
+        assert np.allclose(np.delete(u, [2, 3]), u_ref, atol=1e-3)
+    assert stats[-1].combination[1] == 0
+    assert stats[-1].evaluated + stats[-1].screened == 8
+
+    a.set_thruster_enabled(1)
+    _, res = a.allocate(wanted, relax=False)
+    assert np.isclose(res[1], res_all[1])
+    assert stats[-1].evaluated == evaluated
+
+
+@pytest.mark.parametrize(
+    "solver, compiled",
+    [("quadprog", True), ("quadprog", False), ("nullspace", True), ("diagonal", True)],
+)
+def test_thrust_scale(solver, compiled, mixed_allocator):
+    a = mixed_allocator(solver=solver, compiled=compiled)
+    reference = mixed_allocator(
+        scales=(0.6, 1.0, 0.6, 0.6), solver=solver, compiled=compiled
+    )
+    wanted = [1200, 300, 4000]
+    _, res_full = a.allocate(wanted, relax=False)
+
+    for i in (0, 2, 3):
+        a.set_thrust_scale(i, 0.6)
+    assert a.thrust_scales == (0.6, 1.0, 0.6, 0.6)
+    for relax in (True, False):
+        u, res = a.allocate(wanted, relax=relax)
+        u_ref, res_ref = reference.allocate(wanted, relax=relax)
+        assert np.isclose(res[1], res_ref[1], rtol=1e-6)
+        assert np.allclose(u, u_ref, atol=1e-3)
+
+    with pytest.raises(AllocationError):
+        a.allocate([2500, 0, 0], relax=False)
+
+    for i in (0, 2, 3):
+        a.set_thrust_scale(i)
+    _, res = a.allocate(wanted, relax=False)
+    assert np.isclose(res[1], res_full[1], rtol=1e-6)
+
+    with pytest.raises(ValueError):
+        a.set_thrust_scale(0, 0)
+
+
+@pytest.mark.parametrize("solver", ["quadprog", "nullspace", "diagonal"])
+def test_rate_limit(solver, mixed_allocator):
+    def build(compiled):
+        a = mixed_allocator(solver=solver, compiled=compiled)
+        for t in a.thrusters:
+            t.set_rate_limit(100)
+        return a
+
+    a, reference = build(True), build(False)
+    previous = np.zeros(8)
+    for wanted in [[1500, 0, 0]] * 6 + [[0, 800, 3000]] * 6:
+        u, res = a.allocate(wanted)
+        u_ref, res_ref = reference.allocate(wanted)
+        assert np.isclose(res[1], res_ref[1])
+        assert np.all(np.abs(u - previous) <= 100 + 1e-6)
+        assert np.allclose(a.thrusters[0].thrust, u[:2])
+        previous = u
+    assert np.allclose(res[0][-3:], 0, atol=1)
+
+    # Derating below the current thrust moves the box onto the derated
+    # constraints, instead of leaving every combination infeasible
+    a.set_current_thrust([900, 0, 900, 0, 0, 0, 0, 0])
+    a.set_thrust_scale(0, 0.5)
+    u, _ = a.allocate([1800, 0, 0])
+    assert np.linalg.norm(u[:2]) <= 500 + 1e-6
+    assert np.all(np.abs(u[:2] - [500, 0]) <= 100 + 1e-6)
+    a.set_thrust_scale(0, 1.0)
+
+    # Feedback of the measured thrust, and removing the limits
+    a.set_current_thrust(np.zeros(8))
+    u, _ = a.allocate([1500, 0, 0])
+    assert np.all(np.abs(u) <= 100 + 1e-6)
+    for t in a.thrusters:
+        t.set_rate_limit()
+    u, res = a.allocate([1500, 0, 0])
+    assert np.allclose(res[0][-3:], 0, atol=1)
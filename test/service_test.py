@@ -0,0 +1,72 @@
+"""
+Tests for service module
+"""
+
+import asyncio
+import pytest
+import numpy as np
+
+from quta.thruster import AzimuthThruster
+from quta.allocator import MinimizePowerAllocator
+from quta.service import AsyncAllocator, SupersededError
+
+
+def build():
+    a = MinimizePowerAllocator()
+    a.add_thruster(AzimuthThruster((-20, 5), 1000, 16))
+    a.add_thruster(AzimuthThruster((-20, -5), 1000, 16))
+    return AsyncAllocator(a)
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_coalescing():
+    service = build()
+
+    async def main():
+        return await asyncio.gather(
+            service.allocate([100, 0, 0]),
+            service.allocate([200, 0, 0]),
+            service.allocate([300, 0, 0]),
+            return_exceptions=True,
+        )
+
+    first, second, third = run(main())
+    service.close()
+
+    assert isinstance(first, SupersededError)
+    assert isinstance(second, SupersededError)
+    assert np.allclose(third[0], service.allocator.allocate([300, 0, 0])[0])
+    assert service.superseded == 2
+    assert not service.busy
+
+
+def test_cancellation():
+    service = build()
+
+    async def main():
+        running = asyncio.ensure_future(service.allocate([100, 0, 0], relax=False))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(service.allocate([200, 0, 0]))
+        await asyncio.sleep(0)
+        waiting.cancel()
+
+        u, _ = await running
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        # The service keeps serving after a cancellation
+        u_next, _ = await service.allocate([0, 300, 0], relax=False)
+        return u, u_next
+
+    u, u_next = run(main())
+    service.close()
+
+    assert np.isclose(np.sum(u[::2]), 100)
+    assert np.isclose(np.sum(u_next[1::2]), 300)
@@ -0,0 +1,67 @@
+"""
+Tests for the specialized QP solvers
+"""
+
+import pytest
+import numpy as np
+import quadprog
+
+import quta.solvers as solvers
+from quta.solvers import DiagonalQP
+from quta.thruster import AzimuthThruster
+from quta.allocator import MinimizePowerAllocator
+from quta.constraints import CircleConstraint, Constraint1D
+
+
+def test_diagonal_qp():
+    g = np.array([1.0, 2.0, 1.0, 1.0, 10.0])
+    a = np.zeros(5)
+    E = np.array([[1.0, 0.0, 1.0, 0.0, 1.0], [0.0, 1.0, 0.0, 1.0, 0.0]])
+    circle = CircleConstraint(10, 16).constraints
+    segment = Constraint1D((-5, 0), (5, 0)).constraints
+    qp = DiagonalQP(g, a, E, [((0, 1), circle), ((2, 3), segment)])
+
+    # Reference solution with quadprog
+    C = np.zeros((5, 2 + len(circle[1]) + len(segment[1])))
+    C[:, :2] = E.T
+    C[:2, 2 : 2 + len(circle[1])] = circle[0].T
+    C[2:4, 2 + len(circle[1]) :] = segment[0].T
+    n_eq = 2 + segment[2]
+    order = np.r_[0:2, 2 + len(circle[1]) : C.shape[1], 2 : 2 + len(circle[1])]
+
+    for e in ([3.0, 1.0], [14.0, 4.0], [-20.0, 0.0]):
+        b = np.r_[e, circle[1], segment[1]]
+        ref = quadprog.solve_qp(np.diag(g), a, C[:, order], b[order], n_eq)
+
+        x, f, _, _ = qp.solve(e)
+        assert np.allclose(x, ref[0], atol=1e-6)
+        assert np.isclose(f, ref[1])
+
+    with pytest.raises(ValueError):
+        qp.solve([0.0, 20.0])
+
+
+@pytest.mark.parametrize("name", ["quadprog", "nullspace", "diagonal"])
+def test_backend(name):
+    backend = solvers.BACKENDS[name]()
+    a = MinimizePowerAllocator(solver=backend)
+    a.add_thruster(AzimuthThruster((-20, 5), 1000, 16))
+    a.add_thruster(AzimuthThruster((-20, -5), 1000, 16))
+    assert a.backend is backend
+
+    G, a_ = a.problem_formulation(False)
+    C, b, n_eq = a.assemble_constraints([100, 200, 0], False, (0, 0))
+    problem = backend.prepare(backend.formulate(G, a_), C, 3, a._blocks((0, 0)))
+
+    res = backend.solve(problem, C, b, n_eq)
+    ref = quadprog.solve_qp(G, a_, C, b, n_eq)
+    assert res.status == solvers.OPTIMAL
+    assert np.allclose(res.x, ref[0], atol=1e-6)
+    assert np.isclose(res.objective, ref[1])
+    assert np.all(C.T @ res.x >= b - 1e-6)
+    assert np.allclose(C @ res.lagrangian, G @ res.x - a_, atol=1e-6)
+
+    b[:3] = [5000, 0, 0]
+    res = backend.solve(problem, C, b, n_eq)
+    assert res.status == solvers.INFEASIBLE
+    assert res.x is None
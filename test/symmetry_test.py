@@ -0,0 +1,30 @@
+"""
+Tests for quta.symmetry
+"""
+
+import numpy as np
+
+from quta.thruster import TransverseThruster
+from quta.symmetry import find_symmetries
+
+
+def test_find_symmetries(split_thruster):
+    thrusters = [
+        split_thruster(pos) for pos in [(-20, 5), (-20, -5), (20, 5), (20, -5)]
+    ]
+    symmetries = {s.name: s for s in find_symmetries(thrusters)}
+    assert set(symmetries) == {"mirror_x", "mirror_y", "rotation"}
+
+    # Mirroring in the x-axis swaps port and starboard and the half planes
+    mirror_x = symmetries["mirror_x"]
+    assert mirror_x.permutation == (1, 0, 3, 2)
+    assert mirror_x.transform_combination((0, 0, 1, None)) == (1, 1, None, 0)
+    assert mirror_x.invariant([1000, 0, 0])
+    assert not mirror_x.invariant([1000, 10, 0])
+
+    P = mirror_x.variable_map(11)
+    assert np.allclose(P @ P, np.eye(11))
+
+    # A single bow thruster off the centre line breaks the symmetries
+    thrusters.append(TransverseThruster((30, 1), 500))
+    assert find_symmetries(thrusters) == []
@@ -1,10 +1,12 @@
 """
 Tests for thruster module
 """
+
+import pickle
 import numpy as np
 import pytest
 import quta.thruster as th
-from quta.constraints import Constraint1D, Constraint2D
+from quta.constraints import Constraint1D, Constraint2D, SectorConstraint
 
 
 def test_base_class():
@@ -41,3 +43,62 @@ def test_2D_thrusters(TH):
     assert t.disjunctions == 1
 
     assert isinstance(t.static_constraints()[0], Constraint2D)
+
+
+def test_forbidden_zones():
+    t = th.AzimuthThruster((0, 0), 1000, 18, [(np.deg2rad(-30), np.deg2rad(30))])
+
+    assert t.disjunctions == 2
+    assert t.relaxed_constraint() is not None
+
+
+def test_relaxed_constraint():
+    t = th.Thruster((0, 0))
+    t.add_constraint(SectorConstraint(1, 0, np.pi / 2))
+    t.add_constraint(SectorConstraint(1, np.pi, 3 * np.pi / 2))
+
+    relaxed = t.relaxed_constraint()
+    C, b, _ = relaxed.constraints
+    for constraint in t.static_constraints():
+        assert np.all(C @ constraint.vertices.T >= b[:, None] - 1e-9)
+
+    # A single 1D constraint has a degenerate hull
+    assert th.TransverseThruster((0, 0), 10).relaxed_constraint() is None
+
+
+@pytest.mark.parametrize(
+    "t",
+    [
+        th.Thruster((1, 2)),
+        th.TransverseThruster((1, 2), 1000),
+        th.LongitudinalThruster((1, 2), 1000),
+        th.AzimuthThruster((1, 2), 1000, 16),
+    ],
+)
+def test_slots(t):
+    assert not hasattr(t, "__dict__")
+    copy = pickle.loads(pickle.dumps(t))
+    assert (copy.pos_x, copy.pos_y) == (1, 2)
+    assert copy.disjunctions == t.disjunctions
+
+
+def test_dynamic_constraints():
+    t = th.AzimuthThruster((1, 2), 1000, 16)
+    assert t.rate_limit is None
+    assert t.dynamic_constraints() is None
+
+    t.set_rate_limit((50, 100))
+    t.thrust = [200, -300]
+    C, b, n_eq = t.dynamic_constraints()
+    assert n_eq == 0
+    for u, inside in [([200, -300], True), ([250, -200], True), ([251, -300], False)]:
+        assert np.all(C @ u >= b) == inside
+    C, b, _ = t.dynamic_constraints([0, 0])
+    assert np.allclose(b, [-50, -100, -50, -100])
+
+    t.set_rate_limit(10)
+    assert t.rate_limit == (10, 10)
+    with pytest.raises(ValueError):
+        t.set_rate_limit(-1)
+    t.set_rate_limit()
+    assert t.dynamic_constraints() is None